@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import importlib.util
+import io
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from pydantic import BaseModel
+
+from crawl_cache import normalize_url
+
+"""图片本地化
+把讲演或 websearch 结果中引用的远程图片下载到项目的 public/assets 中，并把链接改写为 /assets/<哈希>.<扩展名>，
+预览和导出时不再反复从网络获取：
+    * 支持 markdown 图片、HTML 的 src 属性以及 frontmatter 中的图片地址（background、figureUrl 等）
+    * 最多同时下载 SLIDEV_MCP_ASSET_CONCURRENCY 个，单个文件不超过 SLIDEV_MCP_ASSET_MAX_MB
+    * 下载结果按内容哈希保存在 SLIDEV_MCP_ROOT/.cache/assets 中，所有项目共享；
+      另外为每个 URL 记录它对应的文件，同一 URL 只下载一次，内容相同的不同 URL 只保存一份
+    * 设置了 SLIDEV_MCP_ASSET_MAX_PX 且安装了 Pillow 时，宽或高超过该值的图片会被等比缩小后再保存
+"""
+
+DEFAULT_ASSET_CONCURRENCY = 8
+DEFAULT_ASSET_MAX_MB = 20
+DOWNLOAD_TIMEOUT = 30
+PROJECT_ASSET_DIR = 'assets'
+
+IMAGE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/svg+xml': '.svg',
+    'image/avif': '.avif',
+    'image/bmp': '.bmp',
+}
+# Pillow 可以安全地重新编码的格式
+RESIZABLE_EXTENSIONS = {'.png': 'PNG', '.jpg': 'JPEG', '.webp': 'WEBP', '.bmp': 'BMP'}
+
+IMAGE_URL_PATTERN = re.compile(
+    r'(?P<md>!\[[^\]]*\]\(\s*<?)(?P<md_url>https?://[^)\s>]+)'
+    r'|(?P<src>\bsrc\s*=\s*["\'])(?P<src_url>https?://[^"\']+)'
+    r'|(?P<fm>^[A-Za-z][\w-]*:[ \t]*["\']?)(?P<fm_url>https?://\S+?\.(?:png|jpe?g|gif|webp|svg|avif|bmp)(?:\?\S*?)?)(?=["\']?[ \t]*$)',
+    re.MULTILINE | re.IGNORECASE)
+
+
+class LocalizedImage(BaseModel):
+    url: str
+    path: Optional[str] = None
+    error: Optional[str] = None
+
+
+def find_image_urls(markdown: str) -> List[str]:
+    """按出现顺序返回去重后的远程图片地址。"""
+    urls = []
+    for match in IMAGE_URL_PATTERN.finditer(markdown):
+        urls.append(match.group('md_url') or match.group('src_url') or match.group('fm_url'))
+    return list(dict.fromkeys(urls))
+
+
+def rewrite_image_urls(markdown: str, mapping: Dict[str, str]) -> str:
+    def replace(match: re.Match) -> str:
+        for prefix, group in (('md', 'md_url'), ('src', 'src_url'), ('fm', 'fm_url')):
+            url = match.group(group)
+            if url:
+                return match.group(prefix) + mapping.get(url, url)
+        return match.group(0)
+
+    return IMAGE_URL_PATTERN.sub(replace, markdown)
+
+
+def guess_extension(url: str, content_type: str) -> Optional[str]:
+    extension = IMAGE_EXTENSIONS.get(content_type.split(';')[0].strip().lower())
+    if extension:
+        return extension
+    suffix = Path(urlsplit(url).path).suffix.lower()
+    if suffix == '.jpeg':
+        return '.jpg'
+    return suffix if suffix in IMAGE_EXTENSIONS.values() else None
+
+
+def downscale(data: bytes, extension: str, max_px: int) -> bytes:
+    """宽或高超过 `max_px` 时等比缩小，没有 Pillow 或格式不支持时原样返回。"""
+    if not max_px or extension not in RESIZABLE_EXTENSIONS or importlib.util.find_spec('PIL') is None:
+        return data
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if max(image.size) <= max_px:
+                return data
+            image.thumbnail((max_px, max_px))
+            output = io.BytesIO()
+            image.save(output, RESIZABLE_EXTENSIONS[extension])
+            return output.getvalue()
+    except (OSError, ValueError):
+        return data
+
+
+class AssetStore:
+    def __init__(self, root: str, concurrency: Optional[int] = None, max_bytes: Optional[int] = None,
+                 max_px: Optional[int] = None):
+        self.directory = Path(root) / '.cache' / 'assets'
+        self.concurrency = concurrency or int(os.environ.get('SLIDEV_MCP_ASSET_CONCURRENCY', DEFAULT_ASSET_CONCURRENCY))
+        self.max_bytes = max_bytes or int(float(os.environ.get('SLIDEV_MCP_ASSET_MAX_MB', DEFAULT_ASSET_MAX_MB)) * 1024 * 1024)
+        self.max_px = max_px if max_px is not None else int(os.environ.get('SLIDEV_MCP_ASSET_MAX_PX', 0))
+
+    async def localize(self, urls: Iterable[str], home: str) -> List[LocalizedImage]:
+        """下载 `urls` 并放入项目的 public/assets，返回每个 URL 在 Slidev 中的引用路径或错误。"""
+        urls = list(dict.fromkeys(urls))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        target = Path(home) / 'public' / PROJECT_ASSET_DIR
+
+        async with httpx.AsyncClient(follow_redirects=True, timeout=DOWNLOAD_TIMEOUT) as client:
+            async def localize_one(url: str) -> LocalizedImage:
+                try:
+                    blob = self._cached_blob(url)
+                    if blob is None:
+                        async with semaphore:
+                            blob = await self._download(client, url)
+                    await asyncio.to_thread(self._install, blob, target)
+                    return LocalizedImage(url=url, path=f'/{PROJECT_ASSET_DIR}/{blob.name}')
+                except (httpx.HTTPError, OSError, ValueError) as e:
+                    return LocalizedImage(url=url, error=str(e) or type(e).__name__)
+
+            return await asyncio.gather(*(localize_one(url) for url in urls))
+
+    def _url_record(self, url: str) -> Path:
+        return self.directory / 'urls' / hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def _cached_blob(self, url: str) -> Optional[Path]:
+        try:
+            name = self._url_record(url).read_text(encoding='utf-8').strip()
+        except OSError:
+            return None
+        blob = self.directory / name
+        return blob if name and blob.is_file() else None
+
+    async def _download(self, client: httpx.AsyncClient, url: str) -> Path:
+        chunks = []
+        size = 0
+        async with client.stream('GET', url) as response:
+            response.raise_for_status()
+            extension = guess_extension(url, response.headers.get('content-type', ''))
+            if extension is None:
+                raise ValueError(f"not an image: {response.headers.get('content-type', 'unknown content type')}")
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise ValueError(f"image larger than {self.max_bytes // (1024 * 1024)} MB")
+                chunks.append(chunk)
+        return await asyncio.to_thread(self._store, url, b''.join(chunks), extension)
+
+    def _store(self, url: str, data: bytes, extension: str) -> Path:
+        data = downscale(data, extension, self.max_px)
+        blob = self.directory / f'{hashlib.sha256(data).hexdigest()[:32]}{extension}'
+        if not blob.is_file():
+            self._atomic_write(blob, data)
+        self._atomic_write(self._url_record(url), blob.name.encode('utf-8'))
+        return blob
+
+    def _install(self, blob: Path, target: Path):
+        """把缓存中的文件放进项目目录，优先使用硬链接。"""
+        destination = target / blob.name
+        if destination.is_file():
+            return
+        target.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(blob, destination)
+        except OSError:
+            shutil.copyfile(blob, destination)
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.asset-', dir=path.parent)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+
+def localized_mapping(results: List[LocalizedImage]) -> Dict[str, str]:
+    return {item.url: item.path for item in results if item.path}
+
@@ -0,0 +1,219 @@
+"""
+讲演常用操作在不同规模下的耗时，结果以 JSON 输出，便于保存并与之前的结果比较。
+
+    python benchmarks/bench_deck.py [--sizes 10,100,1000,10000] [--rounds 50] [--output result.json]
+    python benchmarks/bench_deck.py --compare baseline.json [--threshold 1.25]
+
+每种规模生成一份合成讲演，测量：
+    parse_markdown_slides                : 解析整份 slides.md
+    load_slidev_content_cold / _warm     : slides.md 在服务之外被修改后重新加载 / 已加载时再次打开
+    save_slidev_content                  : 修改中间一页后写回
+    slidev_add_page / slidev_set_page    : 直接调用工具函数（包括写回）
+    transform_parameters_to_frontmatter  : 生成 frontmatter
+websearch 部分在本地启动一个 HTTP 服务器提供 benchmarks/fixtures 中的页面：
+    websearch_crawl  : 每次使用不同的 URL，经过浏览器爬取（需要 crawl4ai 和 Playwright 浏览器，否则跳过）
+    websearch_cached : 同一 URL 重复请求，命中爬取缓存
+--compare 把本次结果与之前保存的 JSON 比较，中位数变慢超过 --threshold 倍的项目会被列出，并以退出码 1 结束。
+"""
+import argparse
+import asyncio
+import functools
+import http.server
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(REPO_ROOT, 'benchmarks', 'fixtures')
+sys.path.insert(0, REPO_ROOT)
+
+# main 在导入时读取 SLIDEV_MCP_ROOT，必须在导入之前设置
+os.environ['SLIDEV_MCP_ROOT'] = tempfile.mkdtemp(prefix='bench-deck-')
+os.environ.setdefault('SLIDEV_MCP_WRITE_MODE', 'sync')
+
+import main
+from utils import parse_markdown_slides
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_ROUNDS = 50
+WEBSEARCH_CRAWL_ROUNDS = 5
+PARAMETERS = {'class': 'text-center', 'background': 'https://example.com/bg.png', 'clicks': 3,
+              'transition': 'fade', 'level': 2, 'hideInToc': 'false'}
+
+
+def make_slide(index: int) -> str:
+    return main.render_page(f"# Slide {index}\n\n- 第 {index} 页的第一个要点\n- second point with `code`\n\n"
+                            f"```python\nprint({index})\n```", 'default', {'class': 'px-10'})
+
+
+def make_deck(size: int) -> str:
+    cover = "---\ntheme: academic\nlayout: cover\ntransition: slide-left\n---\n\n# Benchmark deck"
+    return '\n\n'.join([cover] + [make_slide(index) for index in range(1, size)])
+
+
+def summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        'rounds': len(samples),
+        'median_us': round(statistics.median(samples) * 1e6, 2),
+        'p95_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6, 2),
+        'min_us': round(samples[0] * 1e6, 2),
+    }
+
+
+def measure(fn, rounds: int, setup=None) -> dict:
+    """`setup(round)` 在计时之外执行。"""
+    samples = []
+    for round_index in range(rounds):
+        if setup:
+            setup(round_index)
+        start = time.perf_counter()
+        fn(round_index)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bench_deck(size: int, rounds: int) -> dict:
+    name = f'bench-{size}'
+    home = main.get_project_home(name)
+    os.makedirs(home, exist_ok=True)
+    slides_path = os.path.join(home, 'slides.md')
+    content = make_deck(size)
+    with open(slides_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+    project = main.load_slidev_content(name)
+    middle = size // 2
+
+    def touch_file(round_index):
+        # 改变修改时间，让下一次打开认为文件在服务之外被修改过
+        stat = os.stat(slides_path)
+        os.utime(slides_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+    def edit_middle(round_index):
+        project.store[middle] = make_slide(middle) + f'\n\n<!-- round {round_index} -->'
+
+    results = {
+        'parse_markdown_slides': measure(lambda _: parse_markdown_slides(content), rounds),
+        'load_slidev_content_cold': measure(lambda _: main.load_slidev_content(name), rounds, setup=touch_file),
+        'load_slidev_content_warm': measure(lambda _: main.load_slidev_content(name), rounds),
+    }
+    project = main.load_slidev_content(name)
+    results['save_slidev_content'] = measure(lambda _: main.save_slidev_content(project), rounds, setup=edit_middle)
+    results['slidev_add_page'] = measure(
+        lambda round_index: main.slidev_add_page(f'# Added {round_index}\n\n- point', 'default', {'class': 'px-10'}), rounds)
+    results['slidev_set_page'] = measure(
+        lambda round_index: main.slidev_set_page(middle, f'# Updated {round_index}\n\n- point', 'default', {'class': 'px-10'}), rounds)
+    results['transform_parameters_to_frontmatter'] = measure(
+        lambda _: main.transform_parameters_to_frontmatter(PARAMETERS), rounds)
+    return results
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+async def bench_websearch(rounds: int) -> dict:
+    try:
+        import crawl4ai  # noqa: F401
+    except ImportError:
+        return {'skipped': 'crawl4ai is not installed'}
+
+    handler = functools.partial(QuietHandler, directory=FIXTURES)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    page = sorted(name for name in os.listdir(FIXTURES) if name.endswith('.md'))[0]
+
+    async def timed(url: str) -> float:
+        start = time.perf_counter()
+        result = await main.websearch(url)
+        elapsed = time.perf_counter() - start
+        if not result.success or not result.output:
+            raise RuntimeError(f'websearch {url} failed: {result.message}')
+        return elapsed
+
+    try:
+        crawl = [await timed(f'{base}/{page}?round={index}') for index in range(WEBSEARCH_CRAWL_ROUNDS)]
+        # 第一次爬取包括浏览器启动，单独列出
+        results = {'websearch_first_crawl': summarize(crawl[:1]), 'websearch_crawl': summarize(crawl[1:])}
+        cached_url = f'{base}/{page}?round=0'
+        results['websearch_cached'] = summarize([await timed(cached_url) for _ in range(rounds)])
+        return results
+    except Exception as e:
+        return {'skipped': f'{type(e).__name__}: {e}'}
+    finally:
+        server.shutdown()
+        await main.CRAWLER_POOL.close()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """返回中位数变慢超过 `threshold` 倍的 (规模, 操作, 倍数)。"""
+    regressions = []
+    for group, operations in current['results'].items():
+        for operation, stats in operations.items():
+            before = baseline.get('results', {}).get(group, {}).get(operation)
+            if not isinstance(stats, dict) or not isinstance(before, dict) or not before.get('median_us'):
+                continue
+            ratio = stats['median_us'] / before['median_us']
+            if ratio > threshold:
+                regressions.append((group, operation, round(ratio, 2)))
+    return regressions
+
+
+def run(sizes: list, rounds: int) -> dict:
+    results = {}
+    for size in sizes:
+        results[f'deck_{size}'] = bench_deck(size, rounds)
+    results['websearch'] = asyncio.run(bench_websearch(rounds))
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': sizes,
+            'rounds': rounds,
+        },
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time deck operations at several deck sizes and emit JSON')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)))
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument('--output', default='', help='write the JSON here instead of stdout')
+    parser.add_argument('--compare', default='', help='previous JSON result to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='median slowdown ratio reported as a regression')
+    args = parser.parse_args()
+
+    report = run([int(size) for size in args.sizes.split(',') if size.strip()], args.rounds)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for group, operation, ratio in regressions:
+            print(f'regression: {group}.{operation} is {ratio}x slower', file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,72 @@
+"""
+对比完整导出与只修改一页之后的增量导出。
+
+    python benchmarks/bench_export.py [--slides 200] [--format png] [--slidev /path/to/slidev]
+
+需要可用的 slidev（默认从 PATH 查找）以及 playwright-chromium；pdf 的增量导出还需要 Pillow。
+full        : incremental=False，每次都由 slidev 导出整个讲演
+cold        : 第一次增量导出，页面缓存为空，需要渲染所有页
+one_changed : 修改其中一页后再次增量导出，只渲染这一页
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_runner import CommandRunner
+from export import ExportManager
+from jobs import JobManager
+from registry import OpenProject
+
+
+def make_deck(size: int) -> str:
+    slides = ["---\ntheme: default\nlayout: cover\ntransition: slide-left\n---\n\n# Export benchmark"]
+    for index in range(1, size):
+        slides.append(f"---\nlayout: default\ntransition: slide-left\n---\n\n# Slide {index}\n\n- point {index}\n- another point")
+    return '\n\n'.join(slides)
+
+
+async def timed_export(manager: ExportManager, project: OpenProject, slidev: str, fmt: str, incremental: bool) -> float:
+    start = time.perf_counter()
+    job = manager.submit(project, slidev, fmt, incremental=incremental)
+    await job.task
+    elapsed = time.perf_counter() - start
+    if job.state != 'succeeded':
+        raise RuntimeError(f"export failed: {job.error}\n" + '\n'.join(job.output))
+    return elapsed
+
+
+async def run(size: int, fmt: str, slidev: str):
+    manager = ExportManager(JobManager(CommandRunner()))
+    with tempfile.TemporaryDirectory() as home:
+        with open(os.path.join(home, 'slides.md'), 'w', encoding='utf-8') as f:
+            f.write(make_deck(size))
+        project = OpenProject('bench', home)
+        project.reload()
+
+        results = {
+            'full': await timed_export(manager, project, slidev, fmt, incremental=False),
+            'cold': await timed_export(manager, project, slidev, fmt, incremental=True),
+        }
+        project.store[size // 2] = project.store[size // 2] + '\n- edited'
+        results['one_changed'] = await timed_export(manager, project, slidev, fmt, incremental=True)
+
+    for name, elapsed in results.items():
+        print(f"{name:>12}: {elapsed:8.2f}s")
+    print(f"{'speedup':>12}: {results['full'] / results['one_changed']:8.1f}x (full / one_changed)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare full and incremental slidev export')
+    parser.add_argument('--slides', type=int, default=200)
+    parser.add_argument('--format', choices=['png', 'pdf'], default='png')
+    parser.add_argument('--slidev', default=shutil.which('slidev'))
+    args = parser.parse_args()
+    if not args.slidev:
+        parser.error('slidev not found, install @slidev/cli or pass --slidev')
+    asyncio.run(run(args.slides, args.format, args.slidev))
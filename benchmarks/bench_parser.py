@@ -0,0 +1,96 @@
+"""
+对比旧的逐行解析器与 utils.iter_slide_spans 单次扫描解析器。
+
+    python benchmarks/bench_parser.py
+
+legacy_parse   : 原先 main.py / utils.py 中的实现，加上 load_slidev_content 里的逐页 strip
+parse_slides   : utils.parse_markdown_slides（基于 iter_slide_spans）
+spans_only     : 只计算每一页的偏移，不取出文本
+store_load     : SlideStore.load，mmap 读取 slides.md 并得到每一页的偏移
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slide_store import SlideStore
+from utils import iter_slide_spans, parse_markdown_slides
+
+SIZES = [10, 1000, 10000]
+
+
+def legacy_parse(content: str) -> list:
+    slides = []
+    current_slide = []
+    in_yaml = False
+
+    for line in content.splitlines():
+        if line.strip() == '---' and not in_yaml:
+            if not current_slide:
+                in_yaml = True
+                current_slide.append(line)
+            else:
+                slides.append('\n'.join(current_slide))
+                current_slide = [line]
+                in_yaml = True
+        elif line.strip() == '---' and in_yaml:
+            current_slide.append(line)
+            in_yaml = False
+        else:
+            current_slide.append(line)
+
+    if current_slide:
+        slides.append('\n'.join(current_slide))
+
+    return [slide.strip() for slide in slides if slide.strip()]
+
+
+def make_deck(size: int) -> str:
+    slides = []
+    for index in range(size):
+        slides.append(f"""
+---
+layout: {'figure-side' if index % 5 == 0 else 'default'}
+transition: slide-left
+---
+
+# 第 {index} 页：Slide {index}
+
+- 要点一：{'内容' * 10}
+- 要点二：{'content ' * 10}
+
+```python
+print({index})
+```
+""".strip())
+    return '\n\n'.join(slides)
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == '__main__':
+    print(f"{'slides':>8} | {'bytes':>10} | {'legacy_parse':>13} | {'parse_slides':>13} | {'spans_only':>11} | {'store_load':>11}  (ms)")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in SIZES:
+            content = make_deck(size)
+            encoded = content.encode('utf-8')
+            path = os.path.join(workdir, f'slides-{size}.md')
+            with open(path, 'wb') as f:
+                f.write(encoded)
+            assert legacy_parse(content) == SlideStore.load(path).slides
+
+            repeat = 20 if size < 10000 else 5
+            legacy = best_of(lambda: legacy_parse(content), repeat)
+            parsed = best_of(lambda: parse_markdown_slides(content), repeat)
+            spans = best_of(lambda: list(iter_slide_spans(encoded)), repeat)
+            loaded = best_of(lambda: SlideStore.load(path), repeat)
+            print(f"{size:>8} | {len(encoded):>10} | {legacy:>13.2f} | {parsed:>13.2f} | {spans:>11.2f} | {loaded:>11.2f}")
@@ -0,0 +1,92 @@
+"""
+对比整体重写 slides.md 与 SlideStore 增量写入的耗时。
+
+    python benchmarks/bench_persistence.py
+
+每种规模下分别测量：修改中间一页（长度不变 / 变短）、修改最后一页、追加一页。
+增量写入的耗时应当基本不随幻灯片数量增长。
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slide_store import SlideStore
+
+SIZES = [10, 100, 300, 600, 2000]
+ROUNDS = 200
+
+
+def make_slide(index: int, width: int = 40) -> str:
+    return f"""
+---
+layout: default
+transition: slide-left
+---
+
+# Slide {index}
+
+{'- 这是第 %d 页的要点' % index}
+{'x' * width}
+""".strip()
+
+
+def full_rewrite(path: str, slides: list):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n\n'.join(slides))
+
+
+def timeit(fn) -> float:
+    start = time.perf_counter()
+    for round_index in range(ROUNDS):
+        fn(round_index)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def bench(size: int, workdir: str) -> dict:
+    path = os.path.join(workdir, f'slides-{size}.md')
+    slides = [make_slide(i) for i in range(size)]
+    full_rewrite(path, slides)
+    store = SlideStore.load(path)
+    middle = size // 2
+
+    def baseline(round_index):
+        slides[middle] = make_slide(round_index)
+        full_rewrite(path, slides)
+
+    def set_same_size(round_index):
+        store[middle] = make_slide(middle)
+        store.flush()
+
+    def set_shorter(round_index):
+        store[middle] = make_slide(middle, width=40 - round_index % 20)
+        store.flush()
+
+    def set_last(round_index):
+        store[len(store) - 1] = make_slide(round_index, width=round_index % 60)
+        store.flush()
+
+    def append(round_index):
+        store.append(make_slide(size + round_index))
+        store.flush()
+
+    return {
+        'size': size,
+        'full_rewrite_us': timeit(baseline),
+        'set_middle_us': timeit(set_same_size),
+        'set_middle_shorter_us': timeit(set_shorter),
+        'set_last_us': timeit(set_last),
+        'append_us': timeit(append),
+    }
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as workdir:
+        rows = [bench(size, workdir) for size in SIZES]
+
+    columns = list(rows[0].keys())
+    print(' | '.join(f'{column:>22}' for column in columns))
+    for row in rows:
+        print(' | '.join(f'{row[column]:>22.1f}' if isinstance(row[column], float) else f'{row[column]:>22}' for column in columns))
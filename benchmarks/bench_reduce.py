@@ -0,0 +1,61 @@
+"""
+websearch 结果精简（markdown_reduce）的效果和速度。
+
+    python benchmarks/bench_reduce.py [--fixtures benchmarks/fixtures] [--repeat 200] [--show blog_post]
+
+fixtures 目录中的每个 .md 文件是一份保存下来的爬取结果，报告每个页面精简前后的字符数、删掉的比例以及单次精简耗时；
+--show 打印指定页面精简后的内容，便于检查有没有误删正文。
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markdown_reduce import reduce_markdown
+
+DEFAULT_FIXTURES = Path(__file__).parent / 'fixtures'
+
+
+def best_time(markdown: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        reduce_markdown(markdown)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(fixtures: Path, repeat: int, show: str):
+    pages = sorted(fixtures.glob('*.md'))
+    if not pages:
+        raise SystemExit(f'no fixtures in {fixtures}')
+
+    total_original = total_reduced = 0
+    print(f"{'page':<16}{'original':>10}{'reduced':>10}{'cut':>8}{'removed':>9}{'dupes':>7}{'time':>10}")
+    for page in pages:
+        markdown = page.read_text(encoding='utf-8')
+        reduced, stats = reduce_markdown(markdown)
+        elapsed = best_time(markdown, repeat)
+        total_original += stats.original_chars
+        total_reduced += stats.reduced_chars
+        cut = 1 - stats.reduced_chars / max(stats.original_chars, 1)
+        print(f"{page.stem:<16}{stats.original_chars:>10}{stats.reduced_chars:>10}{cut:>8.1%}"
+              f"{stats.removed_blocks:>9}{stats.duplicate_blocks:>7}{elapsed * 1000:>8.2f}ms")
+        if page.stem == show:
+            print('-' * 70)
+            print(reduced)
+            print('-' * 70)
+
+    print(f"{'total':<16}{total_original:>10}{total_reduced:>10}{1 - total_reduced / max(total_original, 1):>8.1%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure how much markdown_reduce cuts from saved pages and how fast it runs')
+    parser.add_argument('--fixtures', type=Path, default=DEFAULT_FIXTURES)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--show', default='')
+    args = parser.parse_args()
+    run(args.fixtures, args.repeat, args.show)
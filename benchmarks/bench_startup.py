@@ -0,0 +1,95 @@
+"""
+测量 MCP 服务的冷启动：从启动进程到收到 initialize 响应的时间，以及进程的峰值内存。
+
+    python benchmarks/bench_startup.py [--runs 5]
+
+lazy  : 直接运行 main.py（当前的按需导入行为）
+eager : 先 import crawl4ai 再运行 main.py，模拟原先在模块导入时加载爬虫的行为
+峰值内存依赖 os.wait4，仅在 Linux / macOS 上可用。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_PATH = os.path.join(REPO_ROOT, 'main.py')
+
+INITIALIZE_REQUEST = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2025-06-18",
+        "capabilities": {},
+        "clientInfo": {"name": "bench-startup", "version": "0.0.1"},
+    },
+}
+
+EAGER_BOOTSTRAP = (
+    "import runpy, sys\n"
+    "import crawl4ai\n"
+    f"sys.argv = [{MAIN_PATH!r}]\n"
+    f"runpy.run_path({MAIN_PATH!r}, run_name='__main__')\n"
+)
+
+
+def measure(mode: str, root: str) -> dict:
+    if mode == 'eager':
+        command = [sys.executable, '-c', EAGER_BOOTSTRAP]
+    else:
+        command = [sys.executable, MAIN_PATH]
+
+    env = dict(os.environ, SLIDEV_MCP_ROOT=root)
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    process.stdin.write((json.dumps(INITIALIZE_REQUEST) + '\n').encode('utf-8'))
+    process.stdin.flush()
+    response = process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.stdin.close()
+
+    peak_rss_mb = None
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+        divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        peak_rss_mb = usage.ru_maxrss / divisor
+    else:
+        process.wait()
+
+    ok = b'"result"' in response
+    return {'ok': ok, 'initialize_ms': elapsed * 1000, 'peak_rss_mb': peak_rss_mb}
+
+
+def summarize(mode: str, samples: list) -> dict:
+    ok = [sample for sample in samples if sample['ok']]
+    summary = {'mode': mode, 'runs': len(samples), 'failed': len(samples) - len(ok)}
+    if ok:
+        summary['initialize_ms_median'] = statistics.median(sample['initialize_ms'] for sample in ok)
+        summary['initialize_ms_min'] = min(sample['initialize_ms'] for sample in ok)
+        rss = [sample['peak_rss_mb'] for sample in ok if sample['peak_rss_mb'] is not None]
+        if rss:
+            summary['peak_rss_mb_median'] = statistics.median(rss)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure slidev-mcp cold start')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--modes', nargs='+', default=['lazy', 'eager'], choices=['lazy', 'eager'])
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        for mode in args.modes:
+            samples = [measure(mode, root) for _ in range(args.runs)]
+            results.append(summarize(mode, samples))
+
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,246 @@
+"""
+streamable-http 服务的并发压测：N 个模拟的 MCP 客户端同时按脚本操作各自的讲演，统计吞吐量、每个工具的延迟分位数和错误率。
+
+    python benchmarks/load_test.py [--clients 1,4,16] [--pages 10] [--no-export] [--no-websearch] [--output result.json]
+    python benchmarks/load_test.py --server http://127.0.0.1:8000/mcp   # 压测已经在运行的服务
+
+默认在临时的 SLIDEV_MCP_ROOT 下启动 `main.py --transport streamable-http`，并在本地启动一个 HTTP 服务器提供
+benchmarks/fixtures 中的页面作为 websearch 的目标。每个客户端依次执行：
+    slidev_create → slidev_add_page × pages → slidev_set_page × pages → slidev_load → websearch → slidev_export_project
+导出是后台任务，客户端轮询 slidev_job_status 直到结束，整个导出耗时记为 export_job。
+最后检查每个客户端 slidev_load 得到的内容是否全部属于自己的讲演，不一致的次数记为 isolation_errors，
+用于发现会话之间共享状态造成的串扰。
+slidev_create 和导出需要服务端能找到 node 和 slidev；websearch 需要 crawl4ai，缺少时相应的调用会被计为错误。
+"""
+import argparse
+import asyncio
+import functools
+import http.server
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_PATH = os.path.join(REPO_ROOT, 'main.py')
+FIXTURES = os.path.join(REPO_ROOT, 'benchmarks', 'fixtures')
+SERVER_START_TIMEOUT = 60
+EXPORT_TIMEOUT = 600
+JOB_POLL_INTERVAL = 0.5
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server did not listen on port {port} within {timeout}s')
+
+
+def start_server(root: str) -> tuple:
+    port = free_port()
+    env = dict(os.environ, SLIDEV_MCP_ROOT=root)
+    process = subprocess.Popen([sys.executable, MAIN_PATH, '--transport', 'streamable-http', '--port', str(port)],
+                               cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process, SERVER_START_TIMEOUT)
+    except BaseException:
+        process.kill()
+        raise
+    return process, f'http://127.0.0.1:{port}/mcp'
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server() -> tuple:
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=FIXTURES))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """最近秩法。"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.messages = defaultdict(set)
+        self.isolation_errors = 0
+
+    def record(self, tool: str, seconds: float, error: str = ''):
+        self.samples[tool].append(seconds)
+        if error:
+            self.errors[tool] += 1
+            # 每个工具只保留几条不同的错误信息
+            if len(self.messages[tool]) < 3:
+                self.messages[tool].add(error[:200])
+
+    def summary(self, wall: float) -> dict:
+        calls = sum(len(samples) for samples in self.samples.values())
+        errors = sum(self.errors.values())
+        tools = {}
+        for tool, samples in sorted(self.samples.items()):
+            tools[tool] = {
+                'calls': len(samples),
+                'errors': self.errors[tool],
+                'p50_ms': round(percentile(samples, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+                'max_ms': round(max(samples) * 1000, 2),
+            }
+            if self.messages[tool]:
+                tools[tool]['sample_errors'] = sorted(self.messages[tool])
+        return {
+            'wall_seconds': round(wall, 3),
+            'calls': calls,
+            'throughput_calls_per_second': round(calls / wall, 2) if wall else 0,
+            'error_rate': round(errors / calls, 4) if calls else 0,
+            'isolation_errors': self.isolation_errors,
+            'tools': tools,
+        }
+
+
+async def call(session: ClientSession, recorder: Recorder, tool: str, **arguments):
+    """调用工具并记录耗时，返回结构化结果（失败时为 None）。"""
+    start = time.perf_counter()
+    try:
+        result = await session.call_tool(tool, arguments)
+    except Exception as e:
+        recorder.record(tool, time.perf_counter() - start, f'{type(e).__name__}: {e}')
+        return None
+    elapsed = time.perf_counter() - start
+    structured = result.structuredContent or {}
+    if result.isError or structured.get('success') is False:
+        text = result.content[0].text if result.content and hasattr(result.content[0], 'text') else ''
+        recorder.record(tool, elapsed, structured.get('message') or text or 'error')
+        return None
+    recorder.record(tool, elapsed)
+    return structured
+
+
+async def wait_for_job(session: ClientSession, recorder: Recorder, job_id: str) -> str:
+    deadline = time.monotonic() + EXPORT_TIMEOUT
+    while time.monotonic() < deadline:
+        status = await call(session, recorder, 'slidev_job_status', job_id=job_id)
+        state = (status or {}).get('output', {}).get('state', '')
+        if state in ('succeeded', 'failed', 'cancelled'):
+            return state
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+    return 'timeout'
+
+
+async def client_flow(url: str, index: int, level: int, args, fixture_url: str, recorder: Recorder):
+    name = f'load-{level}-{index}'
+    marker = f'client {level}-{index}'
+    try:
+        async with streamablehttp_client(url, timeout=60, sse_read_timeout=EXPORT_TIMEOUT) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                if await call(session, recorder, 'slidev_create', name=name) is None:
+                    return
+                for page in range(args.pages):
+                    await call(session, recorder, 'slidev_add_page', content=f'# {marker} page {page}\n\n- point', layout='default')
+                for page in range(1, args.pages + 1):
+                    await call(session, recorder, 'slidev_set_page', index=page, content=f'# {marker} page {page - 1}\n\n- updated')
+
+                loaded = await call(session, recorder, 'slidev_load', name=name)
+                slides = (loaded or {}).get('output') or []
+                foreign = [slide for slide in slides[1:] if marker not in slide]
+                if loaded is not None and (len(slides) != args.pages + 1 or foreign):
+                    recorder.isolation_errors += 1
+
+                if args.websearch:
+                    fixtures = sorted(name for name in os.listdir(FIXTURES) if name.endswith('.md'))
+                    await call(session, recorder, 'websearch', url=f'{fixture_url}/{fixtures[index % len(fixtures)]}')
+
+                if args.export:
+                    submitted = await call(session, recorder, 'slidev_export_project', format=args.format)
+                    if submitted is not None:
+                        start = time.perf_counter()
+                        state = await wait_for_job(session, recorder, submitted['output']['id'])
+                        recorder.record('export_job', time.perf_counter() - start, '' if state == 'succeeded' else f'export {state}')
+    except Exception as e:
+        recorder.record('session', 0, f'{type(e).__name__}: {e}')
+
+
+async def run_level(url: str, clients: int, args, fixture_url: str) -> dict:
+    recorder = Recorder()
+    start = time.perf_counter()
+    await asyncio.gather(*(client_flow(url, index, clients, args, fixture_url, recorder) for index in range(clients)))
+    result = recorder.summary(time.perf_counter() - start)
+    result['clients'] = clients
+    return result
+
+
+async def run(args) -> dict:
+    fixture_server, fixture_url = start_fixture_server()
+    process = None
+    root = None
+    try:
+        url = args.server
+        if not url:
+            root = tempfile.TemporaryDirectory(prefix='load-test-')
+            process, url = start_server(root.name)
+        levels = []
+        for clients in [int(value) for value in args.clients.split(',') if value.strip()]:
+            level = await run_level(url, clients, args, fixture_url)
+            levels.append(level)
+            print(f"{clients:>4} clients: {level['throughput_calls_per_second']:>8.1f} calls/s, "
+                  f"error rate {level['error_rate']:.2%}, isolation errors {level['isolation_errors']}", file=sys.stderr)
+        return {'server': url, 'pages': args.pages, 'export': args.export, 'websearch': args.websearch, 'levels': levels}
+    finally:
+        fixture_server.shutdown()
+        if process:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if root:
+            root.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the streamable-http MCP server with concurrent scripted clients')
+    parser.add_argument('--clients', default='1,4,16', help='comma separated client counts, each run as one level')
+    parser.add_argument('--pages', type=int, default=10, help='pages each client adds and then updates')
+    parser.add_argument('--format', default='png', choices=['pdf', 'png', 'spa'])
+    parser.add_argument('--no-export', dest='export', action='store_false')
+    parser.add_argument('--no-websearch', dest='websearch', action='store_false')
+    parser.add_argument('--server', default='', help='url of a running server, e.g. http://127.0.0.1:8000/mcp')
+    parser.add_argument('--output', default='', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
@@ -0,0 +1,270 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+from pydantic import BaseModel
+
+from slide_store import SlideStore
+from utils import slide_title, split_frontmatter
+
+"""项目目录
+SLIDEV_MCP_ROOT 下所有项目的清单，slidev_list_projects 直接从内存中的清单回答，不再逐个读取项目目录：
+    * 创建、保存讲演和大纲时更新对应的条目（页数、标题、修改时间、大小、是否有 outline.json）
+    * 清单保存在 SLIDEV_MCP_ROOT/.cache/catalog.json，修改后在下一次列出或退出时写回，重启后直接读取
+    * 每次列出时检查 SLIDEV_MCP_ROOT 本身的修改时间：在服务之外新建、删除或重命名了项目目录时，
+      只扫描目录名，为新增的项目读取 slides.md，删除消失的项目
+    * 在服务之外修改了已有项目的 slides.md 不会改变根目录的修改时间，需要 refresh=True 逐个检查
+    * 每个对话可能各自启动一个服务进程，它们共享同一份清单：写回时在文件锁内重新读取清单，
+      本进程修改或删除过的项目按修改时间取较新的条目，其余项目以文件中的为准；
+      列出时发现清单文件被其他进程改写过，先合并文件中的条目
+以 `.` 开头的目录（缓存等）和没有 slides.md 的目录不是项目。
+"""
+
+CATALOG_FILE = 'catalog.json'
+CATALOG_LOCK_FILE = 'catalog.json.lock'
+CATALOG_VERSION = 1
+
+
+class CatalogEntry(BaseModel):
+    name: str
+    slides: int
+    title: str = ''
+    modified: float = 0
+    size: int = 0
+    has_outline: bool = False
+
+
+def deck_title(cover: str) -> str:
+    """讲演的标题：首页 frontmatter 中的 title，没有时取首页正文的第一个标题。"""
+    frontmatter, body = split_frontmatter(cover)
+    return frontmatter.get('title', '').strip('\'"') or slide_title(body)
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """跨进程的排他锁，阻塞直到拿到锁。"""
+    with open(path, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ProjectCatalog:
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.path = self.root / '.cache' / CATALOG_FILE
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, CatalogEntry]] = None
+        self._root_signature: Optional[int] = None
+        self._dirty = False
+        # 上次写回之后本进程修改、删除过的项目，与其他进程写入的清单合并时使用
+        self._changed: Set[str] = set()
+        self._removed: Set[str] = set()
+        # 上次读取或写入时清单文件的 (修改时间, 大小)
+        self._file_signature: Optional[tuple] = None
+
+    def update(self, name: str, store: SlideStore):
+        """保存讲演之后调用，`store` 为内存中的最新内容。"""
+        entry = self._entry_from_store(name, store)
+        with self._lock:
+            entries = self._load()
+            previous = entries.get(name)
+            if previous:
+                entry.has_outline = previous.has_outline
+            else:
+                entry.has_outline = (self.root / name / 'outline.json').is_file()
+            entries[name] = entry
+            self._touch(name)
+
+    def mark_outline(self, name: str):
+        with self._lock:
+            entry = self._load().get(name)
+            if entry and not entry.has_outline:
+                entry.has_outline = True
+                self._touch(name)
+
+    def list(self, start: int = 0, limit: int = 50, sort: str = 'modified', refresh: bool = False) -> Dict:
+        """按 `sort`（modified 为最近修改在前，name 为名称升序）分页列出项目。"""
+        with self._lock:
+            entries = self._load()
+            if self._file_signature != self._current_file_signature():
+                entries = self._merge_from_disk()
+            self._sync(entries, refresh)
+            ordered = sorted(entries.values(), key=(lambda entry: entry.name) if sort == 'name' else (lambda entry: -entry.modified))
+            self._save()
+            page = ordered[max(start, 0):max(start, 0) + limit] if limit > 0 else ordered[max(start, 0):]
+            return {"total": len(ordered), "projects": [entry.model_dump() for entry in page]}
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _entry_from_store(self, name: str, store: SlideStore) -> CatalogEntry:
+        try:
+            stat = os.stat(store.slides_path)
+            modified, size = stat.st_mtime, stat.st_size
+        except OSError:
+            modified, size = 0, 0
+        return CatalogEntry(name=name, slides=len(store), title=deck_title(store[0]) if len(store) else '',
+                            modified=modified, size=size)
+
+    def _entry_from_disk(self, name: str) -> Optional[CatalogEntry]:
+        home = self.root / name
+        try:
+            entry = self._entry_from_store(name, SlideStore.load(str(home / 'slides.md')))
+        except (OSError, ValueError):
+            return None
+        entry.has_outline = (home / 'outline.json').is_file()
+        return entry
+
+    def _load(self) -> Dict[str, CatalogEntry]:
+        """在持有 `_lock` 时调用，第一次使用时读取清单文件。"""
+        if self._entries is not None:
+            return self._entries
+        self._file_signature = self._current_file_signature()
+        self._entries, self._root_signature = self._read() or ({}, None)
+        return self._entries
+
+    def _read(self) -> Optional[tuple]:
+        """读取清单文件，返回 (条目, 根目录签名)；清单不存在、损坏或版本不同时为 None，需要从目录重建。"""
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            if data.get('version') != CATALOG_VERSION:
+                return None
+            return {item['name']: CatalogEntry(**item) for item in data.get('projects', [])}, data.get('root_signature')
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return None
+
+    def _current_file_signature(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _touch(self, name: str):
+        self._changed.add(name)
+        self._removed.discard(name)
+        self._dirty = True
+
+    def _merge_from_disk(self) -> Dict[str, CatalogEntry]:
+        """在持有 `_lock` 时调用，把其他进程写入的清单与本进程尚未写回的修改合并。"""
+        self._file_signature = self._current_file_signature()
+        disk = self._read()
+        if disk is None:
+            return self._entries
+        merged, signature = disk
+        for name in self._removed:
+            merged.pop(name, None)
+        for name in self._changed:
+            ours, theirs = self._entries.get(name), merged.get(name)
+            if ours is None:
+                continue
+            if theirs is None or ours.modified >= theirs.modified:
+                ours.has_outline = ours.has_outline or bool(theirs and theirs.has_outline)
+                merged[name] = ours
+            else:
+                theirs.has_outline = theirs.has_outline or ours.has_outline
+        # 两边看到的根目录不一致时，下一次列出重新扫描目录
+        if signature != self._root_signature:
+            self._root_signature = None
+        self._entries = merged
+        return merged
+
+    def _sync(self, entries: Dict[str, CatalogEntry], refresh: bool):
+        signature = self._signature()
+        if signature == self._root_signature and not refresh:
+            return
+
+        names = set()
+        try:
+            with os.scandir(self.root) as iterator:
+                for item in iterator:
+                    if not item.name.startswith('.') and item.is_dir():
+                        names.add(item.name)
+        except OSError:
+            pass
+
+        for name in list(entries):
+            if name not in names:
+                del entries[name]
+                self._removed.add(name)
+        for name in names:
+            entry = entries.get(name)
+            if entry is None or (refresh and self._modified_on_disk(entry)):
+                fresh = self._entry_from_disk(name)
+                if fresh:
+                    entries[name] = fresh
+                    self._touch(name)
+                elif entries.pop(name, None):
+                    self._removed.add(name)
+            elif refresh:
+                has_outline = (self.root / name / 'outline.json').is_file()
+                if has_outline != entry.has_outline:
+                    entry.has_outline = has_outline
+                    self._touch(name)
+        self._root_signature = signature
+        self._dirty = True
+
+    def _modified_on_disk(self, entry: CatalogEntry) -> bool:
+        try:
+            stat = os.stat(self.root / entry.name / 'slides.md')
+        except OSError:
+            return True
+        return stat.st_mtime != entry.modified or stat.st_size != entry.size
+
+    def _signature(self) -> Optional[int]:
+        try:
+            return os.stat(self.root).st_mtime_ns
+        except OSError:
+            return None
+
+    def _save(self):
+        """在持有 `_lock` 时调用，只在有修改时写回，写回前在文件锁内合并其他进程写入的清单。"""
+        if not self._dirty or self._entries is None:
+            return
+        if not self.path.parent.is_dir():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 创建 .cache 会改变根目录的修改时间，这不是项目目录的变化
+            self._root_signature = self._signature()
+        with file_lock(self.path.parent / CATALOG_LOCK_FILE):
+            if self._file_signature != self._current_file_signature():
+                self._merge_from_disk()
+            data = {
+                "version": CATALOG_VERSION,
+                "root_signature": self._root_signature,
+                "projects": [entry.model_dump() for entry in self._entries.values()],
+            }
+            fd, tmp_path = tempfile.mkstemp(prefix='.catalog-', dir=self.path.parent)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            self._file_signature = self._current_file_signature()
+        self._changed.clear()
+        self._removed.clear()
+        self._dirty = False
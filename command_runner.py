@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, List, Optional, Union
+
+from pydantic import BaseModel
+
+"""基于 asyncio 的子进程执行
+    * 不阻塞事件循环：streamable-http 下其他会话的请求在命令运行期间照常处理
+    * 同时运行的命令数受 SLIDEV_MCP_MAX_WORKERS 限制，超出的命令排队等待
+    * stdout / stderr 按行回调，调用方可以把它们转发为 MCP 进度通知
+    * 超时或调用方被取消时终止子进程
+"""
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_COMMAND_TIMEOUT = 10
+# 终止子进程时，先 terminate，等待这么多秒后仍未退出再 kill
+KILL_GRACE_SECONDS = 3
+
+OutputCallback = Callable[[str, str], Awaitable[None]]
+
+
+def command_name(command: Union[str, List[str]]) -> str:
+    """命令的程序名（例如 slidev、npm），用作指标标签。"""
+    parts = command.split() if isinstance(command, str) else command
+    return os.path.basename(parts[0]) if parts else ''
+
+
+class CommandResult(BaseModel):
+    returncode: Optional[int] = None
+    stdout: str = ''
+    stderr: str = ''
+    timed_out: bool = False
+    duration: float = 0
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+class CommandRunner:
+    def __init__(self, max_workers: Optional[int] = None, metrics=None):
+        self.max_workers = max_workers or int(os.environ.get('SLIDEV_MCP_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+        self.metrics = metrics
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+
+    async def run(self, command: Union[str, List[str]], cwd: Optional[str] = None,
+                  timeout: Optional[float] = DEFAULT_COMMAND_TIMEOUT,
+                  on_output: Optional[OutputCallback] = None,
+                  on_start: Optional[Callable[[], None]] = None) -> CommandResult:
+        """
+        运行命令并等待结束。字符串命令通过 shell 执行，列表命令直接执行。
+        `on_output(stream, line)` 会在每读到一行输出时被调用，`stream` 为 'stdout' 或 'stderr'。
+        `timeout` 为 None 表示不限时；超时后子进程被终止，`timed_out` 为 True。
+        """
+        async with self._semaphore:
+            if on_start:
+                on_start()
+            start = time.perf_counter()
+            if isinstance(command, str):
+                process = await asyncio.create_subprocess_shell(
+                    command, cwd=cwd, stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            else:
+                process = await asyncio.create_subprocess_exec(
+                    *command, cwd=cwd, stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+
+            stdout: List[str] = []
+            stderr: List[str] = []
+            result = CommandResult()
+            try:
+                await asyncio.wait_for(asyncio.gather(
+                    self._pump(process.stdout, 'stdout', stdout, on_output),
+                    self._pump(process.stderr, 'stderr', stderr, on_output),
+                    process.wait(),
+                ), timeout)
+            except asyncio.TimeoutError:
+                result.timed_out = True
+                await self._terminate(process)
+            except BaseException:
+                # 调用方被取消时不留下孤儿进程
+                await self._terminate(process)
+                raise
+
+            result.returncode = process.returncode
+            result.stdout = ''.join(stdout)
+            result.stderr = ''.join(stderr)
+            result.duration = time.perf_counter() - start
+            if self.metrics is not None:
+                self.metrics.observe('slidev_mcp_subprocess_duration_seconds', result.duration, {
+                    'command': command_name(command),
+                    'status': 'timeout' if result.timed_out else ('ok' if result.returncode == 0 else 'failed'),
+                })
+            return result
+
+    async def _pump(self, stream: asyncio.StreamReader, name: str, sink: List[str],
+                    on_output: Optional[OutputCallback]):
+        while True:
+            raw = await stream.readline()
+            if not raw:
+                return
+            line = raw.decode('utf-8', errors='replace')
+            sink.append(line)
+            if on_output:
+                await on_output(name, line.rstrip())
+
+    async def _terminate(self, process: asyncio.subprocess.Process):
+        if process.returncode is not None:
+            return
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), KILL_GRACE_SECONDS)
+        except ProcessLookupError:
+            pass
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
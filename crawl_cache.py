@@ -0,0 +1,176 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+from pydantic import BaseModel
+
+"""websearch 的磁盘缓存
+缓存位于 SLIDEV_MCP_ROOT/.cache/crawl，每个规范化后的 URL 对应一个 json 文件：
+    * 保存爬取得到的 markdown、ETag / Last-Modified 以及爬取时间
+    * 每个条目有自己的 TTL：优先使用响应头中的 Cache-Control max-age，否则为 SLIDEV_MCP_CRAWL_CACHE_TTL 秒
+    * 过期后先用 If-None-Match / If-Modified-Since 做条件请求，返回 304 则继续使用缓存
+    * 总大小超过 SLIDEV_MCP_CRAWL_CACHE_MAX_MB 时按最近访问时间淘汰
+"""
+
+DEFAULT_CRAWL_CACHE_TTL = 24 * 60 * 60
+DEFAULT_CRAWL_CACHE_MAX_MB = 256
+REVALIDATE_TIMEOUT = 10
+
+
+class CacheEntry(BaseModel):
+    url: str
+    markdown: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float
+    ttl: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.fetched_at < self.ttl
+
+
+def normalize_url(url: str) -> str:
+    """去掉片段、默认端口，统一大小写并排序查询参数，使同一页面的不同写法命中同一条缓存。"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f'{host}:{port}'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+def parse_max_age(headers: Dict[str, str]) -> Optional[float]:
+    cache_control = headers.get('cache-control', '')
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return float(match.group(1)) if match else None
+
+
+class CrawlCache:
+    def __init__(self, root: str, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.directory = Path(root) / '.cache' / 'crawl'
+        self.ttl = ttl if ttl is not None else float(os.environ.get('SLIDEV_MCP_CRAWL_CACHE_TTL', DEFAULT_CRAWL_CACHE_TTL))
+        self.max_bytes = max_bytes or int(float(os.environ.get('SLIDEV_MCP_CRAWL_CACHE_MAX_MB', DEFAULT_CRAWL_CACHE_MAX_MB)) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        # key -> 文件大小，按最近访问排序；第一次使用时才扫描目录
+        self._entries: Optional['OrderedDict[str, int]'] = None
+        self._total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated}
+
+    def key(self, url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """读取缓存条目（可能已经过期），不存在时返回 None。"""
+        key = self.key(url)
+        entries = self._index()
+        if key not in entries:
+            return None
+        try:
+            entry = CacheEntry.model_validate_json(self._path(key).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self._remove(key)
+            return None
+        self._touch(key)
+        return entry
+
+    def put(self, url: str, markdown: str, headers: Optional[Dict[str, str]] = None) -> CacheEntry:
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        max_age = parse_max_age(headers)
+        entry = CacheEntry(
+            url=normalize_url(url),
+            markdown=markdown,
+            etag=headers.get('etag'),
+            last_modified=headers.get('last-modified'),
+            fetched_at=time.time(),
+            ttl=self.ttl if max_age is None else max_age,
+        )
+        self._write(self.key(url), entry)
+        return entry
+
+    async def revalidate(self, entry: CacheEntry) -> bool:
+        """对过期条目发起条件请求，服务器确认未修改时刷新爬取时间并返回 True。"""
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        if not headers:
+            return False
+        try:
+            async with httpx.AsyncClient(follow_redirects=True, timeout=REVALIDATE_TIMEOUT) as client:
+                async with client.stream('GET', entry.url, headers=headers) as response:
+                    if response.status_code != 304:
+                        return False
+        except httpx.HTTPError:
+            return False
+        entry.fetched_at = time.time()
+        self._write(self.key(entry.url), entry)
+        return True
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.json'
+
+    def _index(self) -> 'OrderedDict[str, int]':
+        if self._entries is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            found = []
+            for path in self.directory.glob('*.json'):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, path.stem, stat.st_size))
+            found.sort()
+            self._entries = OrderedDict((key, size) for _, key, size in found)
+            self._total_bytes = sum(self._entries.values())
+        return self._entries
+
+    def _touch(self, key: str):
+        self._index().move_to_end(key)
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def _write(self, key: str, entry: CacheEntry):
+        entries = self._index()
+        data = entry.model_dump_json().encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._total_bytes += len(data) - entries.get(key, 0)
+        entries[key] = len(data)
+        entries.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        entries = self._index()
+        while self._total_bytes > self.max_bytes and len(entries) > 1:
+            key = next(iter(entries))
+            self._remove(key)
+
+    def _remove(self, key: str):
+        entries = self._index()
+        self._total_bytes -= entries.pop(key, 0)
+        self._path(key).unlink(missing_ok=True)
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+from typing import List, Optional, Set
+
+"""常驻的 AsyncWebCrawler 池
+    * 第一次爬取时才启动浏览器，之后的调用复用同一个实例，不再为每个 URL 重新启动/关闭浏览器
+    * 同时进行的爬取（浏览器上下文）数量受 SLIDEV_MCP_CRAWLER_CONTEXTS 限制
+    * 实例爬取超过 SLIDEV_MCP_CRAWLER_MAX_PAGES 个页面、浏览器进程内存增长超过 SLIDEV_MCP_CRAWLER_MAX_RSS_MB，
+      或者健康检查 / 爬取失败时会被回收：新请求使用新实例，旧实例在手上的请求结束后关闭
+内存只统计本池启动的浏览器进程树（启动时新出现的 Playwright / Chromium 子进程及其后代），
+预览服务器、导出等其他子进程不计入；无法识别浏览器进程时不按内存回收。
+crawl4ai（连同 Playwright）体积很大，只在真正需要启动浏览器时才导入，不影响服务冷启动。
+"""
+
+DEFAULT_CRAWLER_CONTEXTS = 4
+DEFAULT_CRAWLER_MAX_PAGES = 100
+DEFAULT_CRAWLER_MAX_RSS_MB = 1024
+# 每爬取多少个页面检查一次内存
+RSS_CHECK_INTERVAL = 10
+
+
+# 启动浏览器时新出现的直接子进程中，命令行包含这些字样的才是浏览器（Playwright 驱动或 Chromium）
+BROWSER_PROCESS_MARKERS = ('playwright', 'chrom')
+
+
+def _child_pids() -> Set[int]:
+    try:
+        import psutil
+    except ImportError:
+        return set()
+    try:
+        return {child.pid for child in psutil.Process().children()}
+    except psutil.Error:
+        return set()
+
+
+def _browser_processes(before: Set[int]) -> list:
+    """启动浏览器后调用：返回 `before` 中没有的、看起来是浏览器的直接子进程，没有 psutil 时为空。"""
+    try:
+        import psutil
+    except ImportError:
+        return []
+    processes = []
+    try:
+        children = psutil.Process().children()
+    except psutil.Error:
+        return []
+    for child in children:
+        if child.pid in before:
+            continue
+        try:
+            cmdline = ' '.join(child.cmdline()).lower()
+        except psutil.Error:
+            continue
+        if any(marker in cmdline for marker in BROWSER_PROCESS_MARKERS):
+            processes.append(child)
+    return processes
+
+
+def _browser_rss_mb(processes: list) -> Optional[float]:
+    """`processes` 及其所有后代的常驻内存之和，没有可统计的进程时返回 None。"""
+    if not processes:
+        return None
+    import psutil
+    total = 0
+    for process in processes:
+        try:
+            # is_running 同时比较创建时间，pid 被复用时不会统计到别的进程
+            if not process.is_running():
+                continue
+            tree = [process] + process.children(recursive=True)
+        except psutil.Error:
+            continue
+        for item in tree:
+            try:
+                total += item.memory_info().rss
+            except psutil.Error:
+                continue
+    return total / (1024 * 1024)
+
+
+class _Lease:
+    """一个已启动的浏览器实例及其使用情况。"""
+
+    def __init__(self, crawler, processes: list):
+        self.crawler = crawler
+        # 该实例的浏览器进程（psutil.Process），内存只统计它们的进程树
+        self.processes = processes
+        self.baseline_rss = _browser_rss_mb(processes)
+        self.pages = 0
+        self.in_flight = 0
+        self.retired = False
+
+
+class CrawlerPool:
+    def __init__(self, max_contexts: Optional[int] = None, max_pages: Optional[int] = None,
+                 max_rss_mb: Optional[float] = None, metrics=None):
+        self.max_contexts = max_contexts or int(os.environ.get('SLIDEV_MCP_CRAWLER_CONTEXTS', DEFAULT_CRAWLER_CONTEXTS))
+        self.max_pages = max_pages or int(os.environ.get('SLIDEV_MCP_CRAWLER_MAX_PAGES', DEFAULT_CRAWLER_MAX_PAGES))
+        self.max_rss_mb = max_rss_mb or float(os.environ.get('SLIDEV_MCP_CRAWLER_MAX_RSS_MB', DEFAULT_CRAWLER_MAX_RSS_MB))
+        self.metrics = metrics
+        self._semaphore = asyncio.Semaphore(self.max_contexts)
+        self._lock = asyncio.Lock()
+        self._current: Optional[_Lease] = None
+        self._retiring: List[_Lease] = []
+        self._closed = False
+
+    async def crawl(self, url: str, **kwargs):
+        """使用池中的浏览器爬取 `url`，参数透传给 `AsyncWebCrawler.arun`。"""
+        async with self._semaphore:
+            lease = await self._checkout()
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                result = await lease.crawler.arun(url, **kwargs)
+                status = 'ok' if getattr(result, 'success', True) else 'failed'
+            except Exception:
+                # 浏览器可能已经崩溃，换一个新实例
+                lease.retired = True
+                raise
+            finally:
+                if self.metrics is not None:
+                    self.metrics.observe('slidev_mcp_crawl_duration_seconds', time.perf_counter() - start, {'status': status})
+                await self._checkin(lease)
+            return result
+
+    async def close(self):
+        """关闭所有浏览器实例，服务退出时调用。"""
+        async with self._lock:
+            self._closed = True
+            leases = self._retiring + ([self._current] if self._current else [])
+            self._current = None
+            self._retiring = []
+        for lease in leases:
+            await self._shutdown(lease)
+
+    async def _checkout(self) -> _Lease:
+        async with self._lock:
+            if self._closed:
+                raise RuntimeError("crawler pool is closed")
+            lease = self._current
+            if lease is not None and not self._healthy(lease):
+                self._retire(lease)
+                lease = None
+            if lease is None:
+                from crawl4ai import AsyncWebCrawler
+                crawler = AsyncWebCrawler()
+                before = _child_pids()
+                await crawler.start()
+                lease = self._current = _Lease(crawler, _browser_processes(before))
+            lease.in_flight += 1
+            lease.pages += 1
+            return lease
+
+    async def _checkin(self, lease: _Lease):
+        async with self._lock:
+            lease.in_flight -= 1
+            if lease is self._current and lease.retired:
+                self._retire(lease)
+            idle = [item for item in self._retiring if item.in_flight == 0]
+            self._retiring = [item for item in self._retiring if item.in_flight > 0]
+        for item in idle:
+            await self._shutdown(item)
+
+    def _healthy(self, lease: _Lease) -> bool:
+        if lease.retired or not getattr(lease.crawler, 'ready', True):
+            return False
+        if lease.pages >= self.max_pages:
+            return False
+        if lease.baseline_rss is not None and lease.pages % RSS_CHECK_INTERVAL == 0:
+            rss = _browser_rss_mb(lease.processes)
+            if rss is not None and rss - lease.baseline_rss > self.max_rss_mb:
+                return False
+        return True
+
+    def _retire(self, lease: _Lease):
+        lease.retired = True
+        if lease is self._current:
+            self._current = None
+        self._retiring.append(lease)
+
+    async def _shutdown(self, lease: _Lease):
+        try:
+            await lease.crawler.close()
+        except Exception:
+            pass
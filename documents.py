@@ -0,0 +1,137 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from crawl_cache import normalize_url
+
+"""websearch 结果的分块读取
+很长的网页（10 万字符以上）不再整篇放进一次工具调用的结果里：
+    * 完整的 markdown 保存在服务端，按 URL 和内容生成文档 id，返回标题大纲和第一块内容；
+      同一 URL 的原文（raw）和精简后的内容、或者网页更新后的内容各是一个文档，之前拿到的游标不会读到另一份内容
+    * 之后用 websearch_read 按游标（字符偏移）或标题读取后续内容，每次最多 SLIDEV_MCP_WEBSEARCH_CHUNK_CHARS 个字符
+    * 分块尽量在标题、空行或换行处断开，代码块中的 `#` 行不算标题
+    * 文档按最近使用保存在内存中，总大小不超过 SLIDEV_MCP_DOCUMENT_MAX_MB；被淘汰的文档重新 websearch 即可（会命中爬取缓存）
+"""
+
+DEFAULT_CHUNK_CHARS = 8000
+DEFAULT_DOCUMENT_MAX_MB = 64
+# 大纲只列出这一级及以上的标题
+OUTLINE_MAX_LEVEL = 3
+OUTLINE_MAX_ITEMS = 200
+
+HEADING_PATTERN = re.compile(r'(#{1,6})[ \t]+(.+?)[ \t#]*$')
+
+
+class Heading(BaseModel):
+    level: int
+    title: str
+    # 标题行在文档中的字符偏移，可以直接作为 websearch_read 的游标
+    cursor: int
+
+
+def extract_headings(markdown: str) -> List[Heading]:
+    headings = []
+    in_fence = False
+    offset = 0
+    for line in markdown.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped.startswith('```') or stripped.startswith('~~~'):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = HEADING_PATTERN.match(stripped)
+            if match:
+                headings.append(Heading(level=len(match.group(1)), title=match.group(2), cursor=offset))
+        offset += len(line)
+    return headings
+
+
+class Document:
+    def __init__(self, url: str, markdown: str):
+        digest = hashlib.sha256(normalize_url(url).encode('utf-8'))
+        digest.update(b'\n' + hashlib.sha256(markdown.encode('utf-8')).digest())
+        self.id = digest.hexdigest()[:16]
+        self.url = url
+        self.markdown = markdown
+        self.headings = extract_headings(markdown)
+
+    @property
+    def outline(self) -> List[Heading]:
+        return [heading for heading in self.headings if heading.level <= OUTLINE_MAX_LEVEL][:OUTLINE_MAX_ITEMS]
+
+    def find_heading(self, title: str) -> Optional[Heading]:
+        """按标题查找，先精确匹配，再忽略大小写做包含匹配。"""
+        folded = title.strip().lower()
+        for heading in self.headings:
+            if heading.title == title.strip():
+                return heading
+        for heading in self.headings:
+            if folded and folded in heading.title.lower():
+                return heading
+        return None
+
+    def chunk(self, cursor: int, size: int) -> Tuple[str, Optional[int]]:
+        """从 `cursor` 开始读取不超过 `size` 个字符，返回 (内容, 下一块的游标)，读完时游标为 None。"""
+        cursor = max(0, min(cursor, len(self.markdown)))
+        end = cursor + size
+        if end >= len(self.markdown):
+            return self.markdown[cursor:], None
+
+        # 在后半块中寻找断点：标题 > 空行 > 换行
+        floor = cursor + size // 2
+        breaks = [heading.cursor for heading in self.headings if floor < heading.cursor <= end]
+        if breaks:
+            end = breaks[-1]
+        else:
+            for separator in ('\n\n', '\n'):
+                found = self.markdown.rfind(separator, floor, end)
+                if found != -1:
+                    end = found + len(separator)
+                    break
+        return self.markdown[cursor:end], end
+
+
+class DocumentStore:
+    def __init__(self, chunk_chars: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.chunk_chars = chunk_chars or int(os.environ.get('SLIDEV_MCP_WEBSEARCH_CHUNK_CHARS', DEFAULT_CHUNK_CHARS))
+        self.max_bytes = max_bytes or int(float(os.environ.get('SLIDEV_MCP_DOCUMENT_MAX_MB', DEFAULT_DOCUMENT_MAX_MB)) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._documents: 'OrderedDict[str, Document]' = OrderedDict()
+        self._total_bytes = 0
+
+    def put(self, url: str, markdown: str) -> Document:
+        document = Document(url, markdown)
+        with self._lock:
+            previous = self._documents.pop(document.id, None)
+            if previous:
+                self._total_bytes -= len(previous.markdown)
+            self._documents[document.id] = document
+            self._total_bytes += len(markdown)
+            # 至少保留刚放入的文档
+            while self._total_bytes > self.max_bytes and len(self._documents) > 1:
+                _, evicted = self._documents.popitem(last=False)
+                self._total_bytes -= len(evicted.markdown)
+        return document
+
+    def get(self, document_id: str) -> Optional[Document]:
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document:
+                self._documents.move_to_end(document_id)
+            return document
+
+    def present(self, document: Document, cursor: int = 0) -> dict:
+        """一块内容以及读取后续内容所需的信息。"""
+        content, next_cursor = document.chunk(cursor, self.chunk_chars)
+        return {
+            "doc_id": document.id,
+            "url": document.url,
+            "total_chars": len(document.markdown),
+            "cursor": cursor,
+            "next_cursor": next_cursor,
+            "content": content,
+        }
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from jobs import Job, JobManager
+from registry import OpenProject
+from utils import split_frontmatter
+
+"""讲演导出
+slidev_export_project 不在工具调用里等待导出完成，而是提交一个后台任务并立即返回任务 id：
+    * pdf / png 通过 `slidev export` 生成，spa 通过 `slidev build` 生成静态站点
+    * 提交时把内存中的讲演写成项目目录下的一个快照文件，导出只读快照，
+      导出期间继续编辑 slides.md 不会影响正在导出的内容，也不需要等待导出结束
+    * 命令通过共享的 CommandRunner 执行，与其他外部命令一起受 SLIDEV_MCP_MAX_WORKERS 限制，
+      不同讲演的导出互不阻塞；同一讲演同一格式的导出同时只运行一个
+    * 任务结束后删除快照，产物路径写入任务的 artifacts，通过 slidev_job_status 获取
+
+增量导出（png，以及安装了 Pillow 时的 pdf）：
+    * 每一页的哈希由页面内容、全局 headmatter、页码以及页面引用的本地图片（路径、大小、修改时间）组成，
+      在末尾追加页面不会使前面页面的缓存失效
+    * 渲染好的页面以 <哈希>.png 缓存在项目的 .cache/pages 中，哈希列表记录在 slides.md 旁边的 .export-manifest.json
+    * 只有缓存中没有的页通过 `slidev export --format png --range` 重新渲染，pdf 由所有页的图片拼接而成
+    * png 导出时输出目录中只有上一次导出写入的页面（记录在目录中的 .export-pages.json）会被替换或删除
+    * 同一讲演的 pdf 和 png 增量导出可以同时运行，各自的快照可能不同；任务运行期间它用到的哈希被登记，
+      导出结束时只删除既不属于当前讲演、也没有被正在运行的任务使用的缓存图片
+"""
+
+EXPORT_FORMATS = ('pdf', 'png', 'spa')
+DEFAULT_EXPORT_TIMEOUT = 600
+EXPORT_DIR = 'exports'
+MANIFEST_NAME = '.export-manifest.json'
+PAGE_CACHE_DIR = Path('.cache') / 'pages'
+# png 增量导出在输出目录中记录自己写入的页面文件，下一次导出只清理这些文件
+PNG_RECORD_NAME = '.export-pages.json'
+# slidev 导出的页面图片以页码命名
+PAGE_FILE_PATTERN = re.compile(r'\d+\.png')
+
+# markdown 图片、HTML 的 src 属性
+ASSET_PATTERN = re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)|\bsrc\s*=\s*["\']([^"\']+)["\']')
+
+
+def default_output(project: OpenProject, fmt: str) -> str:
+    """导出产物的默认位置：pdf 为单个文件，png 和 spa 为目录。"""
+    filename = f'{project.name}.pdf' if fmt == 'pdf' else f'{project.name}-{fmt}'
+    return str(Path(project.home) / EXPORT_DIR / filename)
+
+
+def export_command(slidev: str, entry: str, fmt: str, output: str) -> List[str]:
+    if fmt == 'spa':
+        return [slidev, 'build', entry, '--out', output]
+    return [slidev, 'export', entry, '--format', fmt, '--output', output]
+
+
+def collect_artifacts(fmt: str, output: str) -> List[str]:
+    path = Path(output)
+    if fmt == 'pdf':
+        return [str(path)] if path.is_file() else []
+    if fmt == 'png':
+        return sorted(str(file) for file in path.glob('*.png') if PAGE_FILE_PATTERN.fullmatch(file.name))
+    index = path / 'index.html'
+    return [str(index)] if index.is_file() else []
+
+
+def pillow_available() -> bool:
+    return importlib.util.find_spec('PIL') is not None
+
+
+def local_assets(slide: str, home: str) -> List[Path]:
+    """页面引用的本地文件，`/` 开头的路径按 Slidev 的约定指向项目的 public 目录。"""
+    frontmatter, _ = split_frontmatter(slide)
+    references = [first or second for first, second in ASSET_PATTERN.findall(slide)]
+    references += list(frontmatter.values())
+    assets = []
+    for reference in references:
+        if not reference or re.match(r'^[a-z][a-z0-9+.-]*:', reference, re.IGNORECASE) or reference.startswith('//'):
+            continue
+        reference = reference.split('#', 1)[0].split('?', 1)[0]
+        path = Path(home) / 'public' / reference.lstrip('/') if reference.startswith('/') else Path(home) / reference
+        if path.is_file():
+            assets.append(path)
+    return assets
+
+
+def slide_hashes(slides: List[str], home: str) -> List[str]:
+    """计算每一页的渲染哈希，哈希相同的页渲染结果相同。"""
+    headmatter, _ = split_frontmatter(slides[0]) if slides else ({}, '')
+    shared = json.dumps(sorted(headmatter.items()), ensure_ascii=False)
+    hashes = []
+    for number, slide in enumerate(slides, start=1):
+        digest = hashlib.sha256()
+        digest.update(f'{number}\n{shared}\n'.encode('utf-8'))
+        digest.update(slide.encode('utf-8'))
+        for asset in local_assets(slide, home):
+            stat = asset.stat()
+            digest.update(f'\n{asset}:{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8'))
+        hashes.append(digest.hexdigest()[:32])
+    return hashes
+
+
+def stitch_pdf(pages: List[Path], output: str):
+    """把每一页的图片按顺序拼接成一个 PDF。"""
+    from PIL import Image
+
+    images = [Image.open(page).convert('RGB') for page in pages]
+    try:
+        images[0].save(output, 'PDF', save_all=True, append_images=images[1:], resolution=100.0)
+    finally:
+        for image in images:
+            image.close()
+
+
+class ExportManager:
+    def __init__(self, jobs: JobManager, timeout: Optional[float] = None):
+        self.jobs = jobs
+        self.timeout = timeout or float(os.environ.get('SLIDEV_MCP_EXPORT_TIMEOUT', DEFAULT_EXPORT_TIMEOUT))
+        # 项目目录 -> 正在运行的增量导出用到的页面哈希及其引用数；_assemble 在线程中读取，需要加锁
+        self._pinned: Dict[str, Counter] = {}
+        self._pinned_lock = threading.Lock()
+
+    def submit(self, project: OpenProject, slidev: str, fmt: str, output: str = '', incremental: bool = True) -> Job:
+        """快照当前讲演并提交导出任务，必须在事件循环线程中调用。"""
+        kind = f'export:{project.name}:{fmt}'
+        running = self.jobs.running(kind)
+        if running:
+            return running
+
+        output = os.path.abspath(output or default_output(project, fmt))
+        os.makedirs(output if fmt != 'pdf' else os.path.dirname(output), exist_ok=True)
+
+        # 快照放在项目目录中，slides.md 里的相对路径和 public/ 目录对快照同样有效
+        snapshot = Path(project.home) / f'.export-{uuid.uuid4().hex[:12]}.md'
+        with project.lock:
+            slides = list(project.store)
+            snapshot.write_bytes(project.store.to_bytes())
+
+        if incremental and slides and (fmt == 'png' or (fmt == 'pdf' and pillow_available())):
+            return self._submit_incremental(kind, project, slidev, fmt, output, snapshot, slides)
+
+        def finished(job: Job):
+            snapshot.unlink(missing_ok=True)
+            if job.state == 'succeeded':
+                job.artifacts = collect_artifacts(fmt, output)
+
+        command = export_command(slidev, snapshot.name, fmt, output)
+        return self.jobs.submit(kind, command, cwd=project.home, timeout=self.timeout, on_finish=finished)
+
+    def _submit_incremental(self, kind: str, project: OpenProject, slidev: str, fmt: str, output: str,
+                            snapshot: Path, slides: List[str]) -> Job:
+        home = Path(project.home)
+        cache = home / PAGE_CACHE_DIR
+        hashes = slide_hashes(slides, project.home)
+        missing = [number for number, digest in enumerate(hashes, start=1) if not (cache / f'{digest}.png').is_file()]
+        render_dir = home / '.cache' / snapshot.stem.lstrip('.')
+
+        command = []
+        if missing:
+            command = export_command(slidev, snapshot.name, 'png', str(render_dir))
+            command += ['--range', ','.join(str(number) for number in missing)]
+
+        async def assemble(job: Job):
+            job.output.append(f'{len(missing)}/{len(hashes)} pages rendered, {len(hashes) - len(missing)} reused from cache')
+            job.artifacts = await asyncio.to_thread(self._assemble, home, hashes, render_dir, fmt, output)
+
+        def finished(job: Job):
+            snapshot.unlink(missing_ok=True)
+            shutil.rmtree(render_dir, ignore_errors=True)
+            self._unpin(home, hashes)
+
+        self._pin(home, hashes)
+        return self.jobs.submit(kind, command, cwd=project.home, timeout=self.timeout,
+                                on_finish=finished, finalize=assemble)
+
+    def _assemble(self, home: Path, hashes: List[str], render_dir: Path, fmt: str, output: str) -> List[str]:
+        cache = home / PAGE_CACHE_DIR
+        cache.mkdir(parents=True, exist_ok=True)
+        # slidev 以页码命名图片，位数随总页数补零
+        for rendered in render_dir.glob('*.png') if render_dir.is_dir() else []:
+            if rendered.stem.isdigit() and 1 <= int(rendered.stem) <= len(hashes):
+                os.replace(rendered, cache / f'{hashes[int(rendered.stem) - 1]}.png')
+
+        pages = [cache / f'{digest}.png' for digest in hashes]
+        absent = [number for number, page in enumerate(pages, start=1) if not page.is_file()]
+        if absent:
+            raise RuntimeError(f"slidev did not render pages {absent}")
+
+        if fmt == 'pdf':
+            stitch_pdf(pages, output)
+            artifacts = collect_artifacts(fmt, output)
+        else:
+            artifacts = self._copy_pages(pages, Path(output))
+
+        self._write_manifest(home, hashes)
+        return artifacts
+
+    @staticmethod
+    def _copy_pages(pages: List[Path], target: Path) -> List[str]:
+        """把页面图片复制到输出目录，只删除上一次导出写入、这次不再需要的页面，目录中的其他文件不动。"""
+        width = len(str(len(pages)))
+        names = [f'{number:0{width}d}.png' for number in range(1, len(pages) + 1)]
+        record = target / PNG_RECORD_NAME
+        try:
+            previous = json.loads(record.read_text(encoding='utf-8')).get('pages', [])
+        except (OSError, ValueError, AttributeError):
+            previous = []
+        for stale in set(previous) - set(names):
+            if isinstance(stale, str) and PAGE_FILE_PATTERN.fullmatch(stale):
+                (target / stale).unlink(missing_ok=True)
+        for name, page in zip(names, pages):
+            shutil.copyfile(page, target / name)
+        record.write_text(json.dumps({"pages": names}, indent=2), encoding='utf-8')
+        return [str(target / name) for name in names]
+
+    def _pin(self, home: Path, hashes: List[str]):
+        with self._pinned_lock:
+            self._pinned.setdefault(str(home), Counter()).update(hashes)
+
+    def _unpin(self, home: Path, hashes: List[str]):
+        with self._pinned_lock:
+            pinned = self._pinned.get(str(home))
+            if pinned is None:
+                return
+            pinned.subtract(hashes)
+            pinned += Counter()
+            if not pinned:
+                del self._pinned[str(home)]
+
+    def _write_manifest(self, home: Path, hashes: List[str]):
+        """记录当前讲演每一页的哈希，并删除既不被这些页、也不被正在运行的导出使用的缓存图片。"""
+        (home / MANIFEST_NAME).write_text(json.dumps({"pages": hashes}, indent=2), encoding='utf-8')
+
+        with self._pinned_lock:
+            keep = set(hashes) | set(self._pinned.get(str(home), ()))
+        cache = home / PAGE_CACHE_DIR
+        for cached in cache.glob('*.png') if cache.is_dir() else []:
+            if cached.stem not in keep:
+                cached.unlink(missing_ok=True)
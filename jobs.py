@@ -0,0 +1,135 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from command_runner import CommandRunner
+
+"""后台任务
+耗时的命令（例如全局安装 @slidev/cli）不在工具调用里同步执行，而是作为后台任务运行：
+工具立即返回任务 id，之后通过 slidev_job_status 查询进度、输出和结果，或者用 slidev_job_cancel 取消。
+任务在事件循环中以 asyncio task 的形式运行，命令通过共享的 CommandRunner 执行，受同一个并发上限约束。
+命令成功后还可以运行一个异步的 finalize 步骤（例如整理导出产物），它结束之后任务才算成功，抛出异常则任务失败；
+命令为空的任务不启动子进程，只运行 finalize。
+"""
+
+# 每个任务保留的输出行数
+JOB_OUTPUT_LINES = 200
+# 最多保留多少个已结束的任务
+MAX_FINISHED_JOBS = 100
+
+
+class Job:
+    def __init__(self, kind: str, command: List[str], cwd: Optional[str] = None, timeout: Optional[float] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.command = command
+        self.cwd = cwd
+        self.timeout = timeout
+        self.state = 'queued'
+        self.returncode: Optional[int] = None
+        self.error: Optional[str] = None
+        self.output = deque(maxlen=JOB_OUTPUT_LINES)
+        # 任务产出的文件，例如导出的 PDF，由 on_finish 回调填写
+        self.artifacts: List[str] = []
+        self.lines = 0
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in ('succeeded', 'failed', 'cancelled')
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "command": ' '.join(self.command),
+            "state": self.state,
+            "returncode": self.returncode,
+            "error": self.error,
+            "progress": f"{self.lines} lines of output",
+            "output": list(self.output),
+            "artifacts": self.artifacts,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    def __init__(self, runner: CommandRunner):
+        self.runner = runner
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+
+    def submit(self, kind: str, command: List[str], cwd: Optional[str] = None, timeout: Optional[float] = None,
+               on_finish: Optional[Callable[[Job], None]] = None,
+               finalize: Optional[Callable[[Job], Awaitable[None]]] = None) -> Job:
+        """在当前事件循环中启动任务，必须在事件循环线程中调用。"""
+        job = Job(kind, command, cwd, timeout)
+        self._jobs[job.id] = job
+        self._prune()
+        job.task = asyncio.get_running_loop().create_task(self._run(job, on_finish, finalize))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def running(self, kind: str) -> Optional[Job]:
+        """返回同类型且尚未结束的任务，用来避免重复提交。"""
+        for job in self._jobs.values():
+            if job.kind == kind and not job.done:
+                return job
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if not job or job.done or not job.task:
+            return False
+        job.task.cancel()
+        return True
+
+    async def shutdown(self):
+        """取消所有未结束的任务，服务退出时调用。"""
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.done]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: Job, on_finish: Optional[Callable[[Job], None]],
+                   finalize: Optional[Callable[[Job], Awaitable[None]]]):
+        async def collect(stream: str, line: str):
+            job.output.append(line)
+            job.lines += 1
+
+        def started():
+            job.state = 'running'
+
+        try:
+            success = True
+            if job.command:
+                result = await self.runner.run(job.command, cwd=job.cwd, timeout=job.timeout,
+                                               on_output=collect, on_start=started)
+                job.returncode = result.returncode
+                if result.timed_out:
+                    job.error = f"timeout after {job.timeout}s"
+                success = result.success
+            if success and finalize:
+                job.state = 'running'
+                await finalize(job)
+            job.state = 'succeeded' if success else 'failed'
+        except asyncio.CancelledError:
+            job.state = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            job.state = 'failed'
+        finally:
+            job.finished_at = time.time()
+            if on_finish:
+                on_finish(job)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
@@ -1,25 +1,38 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 from typing import Optional, Union, List, Dict
 from pydantic import BaseModel
-import subprocess
 import sys
-import shutil
 from pathlib import Path
 import os
-from utils import parse_markdown_slides
-from crawl4ai import AsyncWebCrawler
+from registry import OpenProject, ProjectRegistry
+from crawler_pool import CrawlerPool
+from crawl_cache import CrawlCache
+from toolchain import ToolchainProbe
+from jobs import JobManager
+from preview import PreviewManager
+from export import EXPORT_FORMATS, ExportManager
+from documents import DocumentStore
+from catalog import ProjectCatalog
+from search_index import SearchIndex
+from markdown_reduce import reduce_markdown
+from assets import AssetStore, find_image_urls, localized_mapping, rewrite_image_urls
+from command_runner import CommandRunner, OutputCallback
+from metrics import METRICS, InstrumentedFastMCP
+from profiling import Profiler
 import datetime
 from usermcp import register_user_profile_mcp
 import argparse
 import json
+import anyio
+import asyncio
 
-mcp = FastMCP('slidev-mcp-academic')
+# 记录每个工具的调用次数、耗时和数据量，见 metrics.py
+mcp = InstrumentedFastMCP('slidev-mcp-academic', metrics=METRICS)
 
 register_user_profile_mcp(mcp)
 
-# 全局变量存储当前活动的Slidev项目
-ACTIVE_SLIDEV_PROJECT: Optional[Dict] = None
-SLIDEV_CONTENT: List[str] = []
 ACADEMIC_THEME = 'academic'
 
 """根目录配置说明
@@ -47,10 +60,81 @@ def get_project_home(name: str) -> str:
     return os.path.join(SLIDEV_MCP_ROOT, name)
 
 
+# 整个进程共享的爬虫池，浏览器在第一次 websearch 时启动
+CRAWLER_POOL = CrawlerPool(metrics=METRICS)
+CRAWL_CACHE = CrawlCache(SLIDEV_MCP_ROOT)
+DEFAULT_WEBSEARCH_CONCURRENCY = int(os.environ.get('SLIDEV_MCP_WEBSEARCH_CONCURRENCY', 4))
+DEFAULT_WEBSEARCH_TIMEOUT = 60
+# 长网页的完整内容保存在服务端，按块返回
+DOCUMENTS = DocumentStore()
+# 去掉爬取结果中的导航、页脚、cookie 提示等样板内容，缓存中仍保存原始内容
+REDUCE_MARKDOWN = os.environ.get('SLIDEV_MCP_REDUCE_MARKDOWN', '1') != '0'
+
+# 子进程执行池、Node.js / slidev 探测结果的缓存，以及安装等后台任务
+RUNNER = CommandRunner(metrics=METRICS)
+TOOLCHAIN = ToolchainProbe(SLIDEV_MCP_ROOT, RUNNER)
+JOBS = JobManager(RUNNER)
+# 每个项目一个常驻的 slidev 开发服务器，用于实时预览
+PREVIEWS = PreviewManager()
+# pdf / png / spa 导出任务
+EXPORTS = ExportManager(JOBS)
+# 所有项目共享的图片下载缓存
+ASSETS = AssetStore(SLIDEV_MCP_ROOT)
+# 按 --profile / SLIDEV_MCP_PROFILE 采集工具调用的 profile，默认关闭
+PROFILER = Profiler(SLIDEV_MCP_ROOT)
+mcp.profiler = PROFILER
+
+# SLIDEV_MCP_ROOT 下所有项目的清单，供 slidev_list_projects 使用
+CATALOG = ProjectCatalog(SLIDEV_MCP_ROOT)
+# 所有项目的幻灯片和大纲的全文索引，供 slidev_search 使用
+SEARCH = SearchIndex(SLIDEV_MCP_ROOT)
+
+# 每个 MCP 会话各自的活动项目，替代原先的 ACTIVE_SLIDEV_PROJECT / SLIDEV_CONTENT 全局变量
+PROJECTS = ProjectRegistry(get_project_home)
+
+def get_session(ctx: Optional[Context]):
+    """返回当前请求所属的 MCP 会话，直接调用工具函数时为 None。"""
+    if ctx is None:
+        return None
+    try:
+        return ctx.session
+    except ValueError:
+        return None
+
+
 class SlidevResult(BaseModel):
     success: bool
     message: str
-    output: Optional[Union[str, int, List[str]]] = None
+    output: Optional[Union[str, int, List[str], List[int], List[Dict], Dict]] = None
+    # 本次 websearch 调用的缓存命中统计
+    cache: Optional[Dict[str, int]] = None
+    # websearch 精简前后的字符数
+    reduction: Optional[Dict[str, Union[int, bool]]] = None
+
+
+class WebsearchItem(BaseModel):
+    url: str
+    success: bool
+    markdown: Optional[str] = None
+    error: Optional[str] = None
+    # 内容超过一块时 markdown 只是第一块，其余部分通过 websearch_read 读取
+    doc_id: Optional[str] = None
+    next_cursor: Optional[int] = None
+    outline: Optional[List[Dict]] = None
+    reduction: Optional[Dict[str, Union[int, bool]]] = None
+    # cached / revalidated 来自爬取缓存，crawled 为重新爬取
+    source: Optional[str] = None
+
+
+class PageSpec(BaseModel):
+    content: str
+    layout: str = "default"
+    parameters: Dict = {}
+
+
+class IndexedPageSpec(PageSpec):
+    index: int
+    layout: str = ""
 
 
 class OutlineItem(BaseModel):
@@ -60,114 +144,94 @@ class OutlineItem(BaseModel):
 class SaveOutlineParam(BaseModel):
     outlines: List[OutlineItem]
 
-def check_nodejs_installed() -> bool:
-    return shutil.which("node") is not None
+def progress_forwarder(ctx: Optional[Context]) -> Optional[OutputCallback]:
+    """把子进程的每一行输出转发为 `ctx` 所属请求的进度通知，没有 `ctx` 时返回 None。"""
+    if ctx is None:
+        return None
+    lines = 0
 
+    async def forward(stream: str, line: str):
+        nonlocal lines
+        lines += 1
+        await ctx.report_progress(lines, None, f"[{stream}] {line}")
 
-def run_command(command: Union[str, List[str]]) -> SlidevResult:
-    try:
-        result = subprocess.run(
-            command,
-            cwd='./',
-            capture_output=True,
-            text=True,
-            shell=isinstance(command, str),
-            timeout=10,
-            stdin=subprocess.DEVNULL
-        )
-        if result.returncode == 0:
-            return SlidevResult(success=True, message="Command executed successfully", output=result.stdout)
-        else:
-            return SlidevResult(success=False, message=f"Command failed: {result.stderr}")
-    except Exception as e:
-        return SlidevResult(success=False, message=f"Error executing command: {str(e)}")
+    return forward
 
 
-def parse_markdown_slides(content: str) -> list:
-    """
-    解析markdown内容，按YAML front matter切分幻灯片
-    """
-    slides = []
-    current_slide = []
-    in_yaml = False
-    
-    for line in content.splitlines():
-        if line.strip() == '---' and not in_yaml:
-            # 开始YAML front matter
-            if not current_slide:
-                in_yaml = True
-                current_slide.append(line)
-            else:
-                # 遇到新的幻灯片分隔符
-                slides.append('\n'.join(current_slide))
-                current_slide = [line]
-                in_yaml = True
-        elif line.strip() == '---' and in_yaml:
-            # 结束YAML front matter
-            current_slide.append(line)
-            in_yaml = False
-        else:
-            current_slide.append(line)
-    
-    # 添加最后一个幻灯片
-    if current_slide:
-        slides.append('\n'.join(current_slide))
-    
-    return slides
+def load_slidev_content(name: str, session=None) -> Optional[OpenProject]:
+    """把 `session` 的活动项目切换为 `name` 并加载 slides.md。"""
+    return PROJECTS.open(session, name)
 
 
-def load_slidev_content(name: str) -> bool:
-    global SLIDEV_CONTENT, ACTIVE_SLIDEV_PROJECT
-    home = get_project_home(name)
-    
-    slides_path = Path(home) / "slides.md"
-    # if not slides_path.exists():
-    #     return True
-    
-    with open(slides_path.absolute(), 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # 初始化全局变量
-    ACTIVE_SLIDEV_PROJECT = {
-        "name": name,
-        "home": home,
-        "slides_path": str(slides_path)
-    }
+def save_slidev_content(project: Optional[OpenProject]) -> bool:
+    if not project:
+        return False
     
-    slides = parse_markdown_slides(content)
-    SLIDEV_CONTENT = [slide.strip() for slide in slides if slide.strip()]
+    # 只写回发生变化的页，或者在文件末尾追加；write-behind 模式下推迟写回
+    with project.lock:
+        project.save()
+        CATALOG.update(project.name, project.store)
+        SEARCH.update_deck(project.name, project.store)
+    PREVIEWS.touch(project.name)
     return True
 
 
-def save_slidev_content() -> bool:
-    global ACTIVE_SLIDEV_PROJECT, SLIDEV_CONTENT
-    
-    if not ACTIVE_SLIDEV_PROJECT:
+def flush_slidev_content(project: Optional[OpenProject]) -> bool:
+    """立即把 `project` 写回 slides.md，在需要磁盘上的最新内容时调用（预览、导出）。"""
+    if not project:
         return False
-    
-    with open(ACTIVE_SLIDEV_PROJECT["slides_path"], 'w', encoding='utf-8') as f:
-        f.write('\n\n'.join(SLIDEV_CONTENT))
-    
+
+    with project.lock:
+        project.flush()
+        CATALOG.update(project.name, project.store)
+    PREVIEWS.touch(project.name)
     return True
 
 
-def save_outline_content(outline: SaveOutlineParam) -> bool:
+def save_outline_content(project: Optional[OpenProject], outline: SaveOutlineParam) -> bool:
     """
     保存大纲到 outline.json 文件
     """
-    global ACTIVE_SLIDEV_PROJECT
-    
-    if not ACTIVE_SLIDEV_PROJECT:
+    if not project:
         return False
     
-    outline_path = os.path.join(ACTIVE_SLIDEV_PROJECT["home"], "outline.json")
+    outline_path = os.path.join(project.home, "outline.json")
         
     with open(outline_path, 'w', encoding='utf-8') as f:
         f.write(outline.model_dump_json(indent=2))
 
+    CATALOG.mark_outline(project.name)
+    SEARCH.update_outline(project.name)
     return True
 
 
+def deck_output(project: OpenProject, summary: bool = False, start: int = 0, limit: int = 0,
+                known_hashes: Optional[List[str]] = None) -> Union[List[str], Dict]:
+    """
+    slidev_load / slidev_create 返回的讲演内容，调用时需要持有 `project.lock`。
+    不带任何选项时保持原来的格式（所有页的字符串列表），否则返回页数和每一页的摘要，
+    `known_hashes` 为客户端已有的各页哈希，只返回哈希不同的页。
+    """
+    if not (summary or start or limit or known_hashes):
+        return list(project.store)
+
+    index = project.store.index
+    total = len(project.store)
+    start = max(start, 0)
+    stop = total if limit <= 0 else min(total, start + limit)
+    known_hashes = known_hashes or []
+
+    slides = []
+    for page in range(start, stop):
+        item = index.summary(page)
+        if page < len(known_hashes) and known_hashes[page] == item['hash']:
+            continue
+        if not summary:
+            item['content'] = project.store[page]
+        slides.append(item)
+    return {"total": total, "slides": slides}
+
+
 def transform_parameters_to_frontmatter(parameters: dict):
     frontmatter = ''
     for key in parameters.keys():
@@ -176,11 +240,40 @@ def transform_parameters_to_frontmatter(parameters: dict):
     return frontmatter.strip()
 
 
+def render_page(content: str, layout: str, parameters: dict) -> str:
+    """根据内容、layout 和 frontmatter 参数生成一页幻灯片的 markdown。"""
+    parameters = dict(parameters)
+    parameters['layout'] = layout
+    parameters['transition'] = 'slide-left'
+    frontmatter_string = transform_parameters_to_frontmatter(parameters)
+
+    return f"""
+---
+{frontmatter_string}
+---
+
+{content}
+
+""".strip()
+
+
+def validate_page_spec(spec: PageSpec) -> Optional[str]:
+    """检查一页的内容能否安全写入 slides.md，返回错误信息或 None。"""
+    if any(line.strip() == '---' for line in spec.content.splitlines()):
+        return "content must not contain a `---` line, it would start a new slide"
+    for key, value in spec.parameters.items():
+        if not str(key).strip() or '\n' in str(key) or ':' in str(key):
+            return f"invalid frontmatter key: {key!r}"
+        if '\n' in str(value):
+            return f"frontmatter value of {key!r} must be a single line"
+    return None
+
+
 @mcp.prompt()
 def slidev_generate_prompt():
     """guide the ai to use slidev"""
     return f"""
-你是一个擅长使用 slidev 进行讲演生成的 agent，如果用户给你输入超链接，你需要调用 websearch 工具来获取对应的文本。对于返回的文本，如果你看到了验证码，网络异常等等代表访问失败的信息，你需要提醒用户本地网络访问受阻，请手动填入需要生成讲演的文本。
+你是一个擅长使用 slidev 进行讲演生成的 agent，如果用户给你输入超链接，你需要调用 websearch 工具来获取对应的文本。如果有多个超链接，请使用 websearch_many 工具一次性并行获取。对于返回的文本，如果你看到了验证码，网络异常等等代表访问失败的信息，你需要提醒用户本地网络访问受阻，请手动填入需要生成讲演的文本。
 当你生成讲演的每一页时，一定要严格按照用户输入的文本内容或者你通过 websearch 获取到的文本内容来。请记住，在获取用户输入之前，你一无所知，请不要自己编造不存在的事实，扭曲文章的原本含义，或者是不经过用户允许的情况下扩充本文的内容。
 请一定要尽可能使用爬取到的文章中的图片，它们往往是以 ![](https://adwadaaw.png) 的形式存在的。
 
@@ -215,7 +308,7 @@ def slidev_generate_with_specific_outlines_prompt(title: str, content: str, outl
 {content}
 </CONTENT>
 
-请严格根据大纲中的内容调用工具来生成 slidev，outlines中的每一个元素，都对应一页 slidev 的页，你需要使用 `slidev_add_page` 来创建它。
+请严格根据大纲中的内容调用工具来生成 slidev，outlines中的每一个元素，都对应一页 slidev 的页，你需要使用 `slidev_add_page` 来创建它。如果一次生成多页，请使用 `slidev_add_pages` 批量创建，修改多页时使用 `slidev_set_pages`。
 
 所有步骤结束后，你需要调用 `slidev_export_project` 来导出项目。
 """
@@ -245,42 +338,188 @@ def outline_generate_prompt(title: str, content: str):
     """
 
 
+async def fetch_markdown(url: str):
+    """获取 `url` 的 markdown，优先使用缓存，返回 (markdown, 来源)。"""
+    entry = CRAWL_CACHE.get(url)
+    if entry and entry.fresh:
+        CRAWL_CACHE.hits += 1
+        return entry.markdown, "cached"
+    if entry and await CRAWL_CACHE.revalidate(entry):
+        CRAWL_CACHE.hits += 1
+        CRAWL_CACHE.revalidated += 1
+        return entry.markdown, "revalidated"
+
+    CRAWL_CACHE.misses += 1
+    result = await CRAWLER_POOL.crawl(url)
+    # 只缓存成功的爬取结果，避免把验证码、网络错误页面缓存下来
+    if getattr(result, 'success', True) and result.markdown:
+        CRAWL_CACHE.put(url, result.markdown, getattr(result, 'response_headers', None))
+    return result.markdown, "crawled"
+
+
+def cache_stats(sources: List[str]) -> Dict[str, int]:
+    """按本次调用中每个网页的来源统计缓存命中，与 CrawlCache.stats 的字段相同。"""
+    return {
+        "hits": sum(source in ("cached", "revalidated") for source in sources),
+        "misses": sources.count("crawled"),
+        "revalidated": sources.count("revalidated"),
+    }
+
+
+async def fetch_reduced(url: str, raw: bool = False):
+    """获取 `url` 的 markdown 并去掉样板内容，返回 (markdown, 来源, 精简统计)，未精简时统计为 None。"""
+    markdown, source = await fetch_markdown(url)
+    if raw or not REDUCE_MARKDOWN or not markdown:
+        return markdown, source, None
+    reduced, stats = await asyncio.to_thread(reduce_markdown, markdown)
+    return reduced, source, stats.model_dump()
+
+
 @mcp.tool(
     name='websearch',
-    description='search the given https url and get the markdown text of the website'
+    description='search the given https url and get the markdown text of the website. Navigation, footers, cookie banners and repeated paragraphs are removed unless raw=true. Long pages return a doc_id, an outline and the first chunk; read the rest with websearch_read'
 )
-async def websearch(url: str) -> SlidevResult:
-    async with AsyncWebCrawler() as crawler:
-        result = await crawler.arun(url)
-        return SlidevResult(success=True, message="success", output=result.markdown)
+async def websearch(url: str, raw: bool = False) -> SlidevResult:
+    markdown, source, reduction = await fetch_reduced(url, raw)
+    message = "success" if source == "crawled" else f"success ({source})"
+    if reduction and reduction['fallback']:
+        message += ", not reduced: almost everything looked like boilerplate"
+    elif reduction:
+        message += f", reduced {reduction['original_chars']} -> {reduction['reduced_chars']} chars"
+    if not markdown or len(markdown) <= DOCUMENTS.chunk_chars:
+        return SlidevResult(success=True, message=message, output=markdown, cache=cache_stats([source]), reduction=reduction)
+
+    document = DOCUMENTS.put(url, markdown)
+    output = DOCUMENTS.present(document)
+    output["outline"] = [heading.model_dump() for heading in document.outline]
+    message += (f", long page: showing the first {len(output['content'])} of {len(markdown)} chars. "
+                f"Read more with websearch_read(doc_id, cursor=next_cursor) or websearch_read(doc_id, heading=...)")
+    return SlidevResult(success=True, message=message, output=output, cache=cache_stats([source]), reduction=reduction)
 
 
 @mcp.tool()
-def slidev_check_environment() -> SlidevResult:
-    """check if nodejs and slidev-cli is ready"""
-    if not check_nodejs_installed():
+def websearch_read(doc_id: str, cursor: int = 0, heading: str = "") -> SlidevResult:
+    """
+    read more of a long page returned by `websearch` / `websearch_many`.
+    - `cursor`: character offset to start from, use `next_cursor` of the previous result
+    - `heading`: start at the section with this title (see `outline`), takes precedence over `cursor`
+    `next_cursor` is null when the end of the page is reached.
+    """
+    document = DOCUMENTS.get(doc_id)
+    if not document:
+        return SlidevResult(success=False, message=f"Unknown document {doc_id}, it may have expired. Call websearch again to reload it.")
+    if heading:
+        found = document.find_heading(heading)
+        if not found:
+            return SlidevResult(success=False, message=f"No heading matching {heading!r} in {document.url}")
+        cursor = found.cursor
+    output = DOCUMENTS.present(document, cursor)
+    return SlidevResult(success=True, message=f"chars {cursor}-{cursor + len(output['content'])} of {len(document.markdown)}", output=output)
+
+
+@mcp.tool()
+async def websearch_many(urls: List[str], concurrency: int = 0, timeout: float = DEFAULT_WEBSEARCH_TIMEOUT, raw: bool = False, ctx: Context = None) -> SlidevResult:
+    """
+    search several https urls in parallel and get the markdown text of each website.
+    - `concurrency`: max pages fetched at the same time, 0 means server default
+    - `timeout`: seconds allowed for each url
+    - `raw`: keep navigation, footers and other boilerplate instead of removing it
+    Each finished page is reported through progress notifications; the final output lists every url with `success`, `markdown`, `error`
+    and `source` (`cached` / `revalidated` from the crawl cache, `crawled` when fetched again).
+    For long pages `markdown` is only the first chunk; `doc_id`, `next_cursor` and `outline` tell how to read the rest with `websearch_read`.
+    """
+    urls = list(dict.fromkeys(urls))
+    semaphore = asyncio.Semaphore(concurrency if concurrency > 0 else DEFAULT_WEBSEARCH_CONCURRENCY)
+
+    async def fetch_one(url: str) -> WebsearchItem:
+        async with semaphore:
+            try:
+                markdown, source, reduction = await asyncio.wait_for(fetch_reduced(url, raw), timeout)
+                if not markdown or len(markdown) <= DOCUMENTS.chunk_chars:
+                    return WebsearchItem(url=url, success=True, markdown=markdown, reduction=reduction, source=source)
+                document = DOCUMENTS.put(url, markdown)
+                first = DOCUMENTS.present(document)
+                return WebsearchItem(url=url, success=True, markdown=first["content"], doc_id=document.id,
+                                     next_cursor=first["next_cursor"], outline=[heading.model_dump() for heading in document.outline],
+                                     reduction=reduction, source=source)
+            except asyncio.TimeoutError:
+                return WebsearchItem(url=url, success=False, error=f"timeout after {timeout}s")
+            except Exception as e:
+                return WebsearchItem(url=url, success=False, error=str(e))
+
+    items: Dict[str, WebsearchItem] = {}
+    for finished in asyncio.as_completed([fetch_one(url) for url in urls]):
+        item = await finished
+        items[item.url] = item
+        if ctx is not None:
+            status = f"fetched {item.url} ({len(item.markdown or '')} chars)" if item.success else f"failed {item.url}: {item.error}"
+            await ctx.report_progress(len(items), len(urls), status)
+
+    results = [items[url] for url in urls]
+    failed = [item.url for item in results if not item.success]
+    message = f"{len(urls) - len(failed)}/{len(urls)} pages fetched"
+    if failed:
+        message += f", failed: {', '.join(failed)}"
+    return SlidevResult(success=not failed, message=message, output=[item.model_dump() for item in results],
+                        cache=cache_stats([item.source for item in results if item.source]))
+
+
+@mcp.tool()
+async def slidev_check_environment(refresh: bool = False, ctx: Context = None) -> SlidevResult:
+    """
+    check if nodejs and slidev-cli is ready. The result is cached, pass `refresh=True` to probe again.
+    The output of the probe is streamed as progress notifications.
+    If slidev-cli is missing, a background install job is started; poll it with `slidev_job_status` for its output.
+    """
+    status = await TOOLCHAIN.status(refresh=refresh, on_output=progress_forwarder(ctx))
+    if not status.node:
         return SlidevResult(success=False, message="Node.js is not installed. Please install Node.js first.")
     
-    result = run_command("slidev --version")
-    if not result.success:
-        return run_command("npm install -g @slidev/cli")
-    return SlidevResult(success=True, message="环境就绪，slidev 可以使用", output=result.output)
+    if status.ready:
+        return SlidevResult(success=True, message="环境就绪，slidev 可以使用", output=status.slidev_version)
+
+    if not status.npm:
+        return SlidevResult(success=False, message="slidev-cli is not installed and npm is not available. Please run `npm install -g @slidev/cli` manually.")
+
+    job = JOBS.running('install-slidev') or JOBS.submit(
+        'install-slidev',
+        [status.npm, 'install', '-g', '@slidev/cli'],
+        on_finish=lambda job: TOOLCHAIN.invalidate()
+    )
+    return SlidevResult(success=False, message=f"slidev-cli is not installed, installing in background job {job.id}. Check progress with slidev_job_status.", output=job.to_dict())
+
+
+@mcp.tool()
+def slidev_job_status(job_id: str) -> SlidevResult:
+    """get state, progress and recent output of a background job"""
+    job = JOBS.get(job_id)
+    if not job:
+        return SlidevResult(success=False, message=f"Unknown job: {job_id}")
+    return SlidevResult(success=True, message=f"Job {job_id} is {job.state}", output=job.to_dict())
 
 
 @mcp.tool()
-def slidev_create(name: str) -> SlidevResult:
+def slidev_job_cancel(job_id: str) -> SlidevResult:
+    """cancel a queued or running background job"""
+    if JOBS.cancel(job_id):
+        return SlidevResult(success=True, message=f"Job {job_id} cancelled")
+    return SlidevResult(success=False, message=f"Job {job_id} is unknown or already finished")
+
+
+@mcp.tool()
+async def slidev_create(name: str, summary: bool = False, start: int = 0, limit: int = 0, known_hashes: List[str] = [], ctx: Context = None) -> SlidevResult:
     """
     create slidev, you need to ask user to get title and author to continue the task.
     you don't know title and author at beginning.
     `name`: name of the project
+    If the project already exists its slides are returned; `summary`, `start`, `limit` and `known_hashes` work as in `slidev_load`.
     """
-    global ACTIVE_SLIDEV_PROJECT, SLIDEV_CONTENT
+    session = get_session(ctx)
 
-    # clear global var
-    ACTIVE_SLIDEV_PROJECT = None
-    SLIDEV_CONTENT = []
+    # 清空当前会话的活动项目
+    PROJECTS.close(session)
     
-    env_check = slidev_check_environment()
+    env_check = await slidev_check_environment(ctx=ctx)
     if not env_check.success:
         return env_check
     
@@ -295,10 +534,9 @@ def slidev_create(name: str) -> SlidevResult:
 
         # 如果已经存在 slides.md，则读入内容，初始化
         if os.path.exists(slides_path):
-            load_slidev_content(name)
-            return SlidevResult(success=True, message=f"项目已经存在于 {home}/slides.md 中", output=SLIDEV_CONTENT)
-        else:
-            SLIDEV_CONTENT = []
+            project = load_slidev_content(name, session)
+            with project.lock:
+                return SlidevResult(success=True, message=f"项目已经存在于 {home}/slides.md 中", output=deck_output(project, summary, start, limit, known_hashes))
 
         with open(slides_path, 'w') as f:
             f.write(f"""
@@ -314,8 +552,12 @@ transition: slide-left
 """.strip())
         
         # 尝试加载内容
-        if not load_slidev_content(name):
+        project = load_slidev_content(name, session)
+        if not project:
             return SlidevResult(success=False, message="successfully create project but fail to load file", output=name)
+        with project.lock:
+            CATALOG.update(name, project.store)
+            SEARCH.update_deck(name, project.store)
             
         return SlidevResult(success=True, message=f"successfully load slidev project {name}", output=name)
         
@@ -328,26 +570,73 @@ transition: slide-left
 
 
 @mcp.tool()
-def slidev_load(name: str) -> SlidevResult:
-    """load exist slidev project and get the current slidev markdown content"""
+def slidev_list_projects(start: int = 0, limit: int = 50, sort: str = "modified", refresh: bool = False) -> SlidevResult:
+    """
+    list the slidev projects under the server root, use the names with `slidev_load`.
+    - `start`, `limit`: page through the list
+    - `sort`: `modified` (most recently changed first) or `name`
+    - `refresh`: re-check every project on disk, only needed after editing slides.md outside the server
+    Each project has name, slides (page count), title, modified (unix time), size (bytes) and has_outline.
+    """
+    if sort not in ('modified', 'name'):
+        return SlidevResult(success=False, message=f"Unknown sort {sort!r}, use modified or name")
+    output = CATALOG.list(start, limit, sort, refresh)
+    message = f"{output['total']} projects"
+    if len(output['projects']) < output['total']:
+        message += f", showing {start}-{start + len(output['projects'])}"
+    return SlidevResult(success=True, message=message, output=output)
+
+
+@mcp.tool()
+async def slidev_search(query: str, limit: int = 20, project: str = "", refresh: bool = False) -> SlidevResult:
+    """
+    full-text search over the slides and outlines of every project, to find and reuse earlier work.
+    - `query`: words or Chinese text; every part must appear, consecutive Chinese characters are matched as a phrase
+    - `limit`: max number of hits
+    - `project`: only search this project
+    - `refresh`: re-check every project on disk, only needed after editing files outside the server
+    Hits are ranked best first, each with project, source (`slides` or `outline`), page (slide or outline item index),
+    title, snippet and score. Use `slidev_load` and `slidev_get_page` to get the full slide.
+    """
+    if not query.strip():
+        return SlidevResult(success=False, message="Empty query")
+    try:
+        # 第一次检索或 refresh 时要为很多项目建立索引，放到线程里，不阻塞其他会话
+        hits = await asyncio.to_thread(SEARCH.search, query, limit, project, refresh)
+    except Exception as e:
+        return SlidevResult(success=False, message=f"Search index unavailable: {str(e)}")
+    return SlidevResult(success=True, message=f"{len(hits)} hits", output=[hit.model_dump() for hit in hits])
+
+
+@mcp.tool()
+def slidev_load(name: str, summary: bool = False, start: int = 0, limit: int = 0, known_hashes: List[str] = [], ctx: Context = None) -> SlidevResult:
+    """
+    load exist slidev project and get the current slidev markdown content.
+    Without options the output is the list of all slides. For big decks use:
+    - `summary`: return only index, layout, title and content hash of each slide
+    - `start`, `limit`: return only slides [start, start + limit); `limit` 0 means up to the end
+    - `known_hashes`: hashes of the slides you already have, in order; only slides whose hash differs are returned
+    With any option the output is {"total": number of slides, "slides": [{index, layout, title, hash, content}]}
+    """
     # 兼容：传入的 name 视为项目名，而不是完整路径
     slides_path = Path(get_project_home(name)) / "slides.md"
 
-    if load_slidev_content(name):
-        return SlidevResult(success=True, message=f"Slidev project loaded from {slides_path.absolute()}", output=SLIDEV_CONTENT) 
+    project = load_slidev_content(name, get_session(ctx))
+    if project:
+        with project.lock:
+            return SlidevResult(success=True, message=f"Slidev project loaded from {slides_path.absolute()}", output=deck_output(project, summary, start, limit, known_hashes))
     return SlidevResult(success=False, message=f"Failed to load Slidev project from {slides_path.absolute()}")
 
 
 @mcp.tool()
-def slidev_make_cover(title: str, subtitle: str = "", author: str = "", background: str = "", python_string_template: str = "") -> SlidevResult:
+def slidev_make_cover(title: str, subtitle: str = "", author: str = "", background: str = "", python_string_template: str = "", ctx: Context = None) -> SlidevResult:
     """
     Create or update slidev cover.
     `python_string_template` is python string template, you can use {title}, {subtitle} to format the string.
     If user give enough information, you can use it to update cover page, otherwise you must ask the lacking information. `background` must be a valid url of image
     """
-    global SLIDEV_CONTENT
-    
-    if not ACTIVE_SLIDEV_PROJECT:
+    project = PROJECTS.get(get_session(ctx))
+    if not project:
         return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
     
     date = datetime.datetime.now().strftime("%Y-%m-%d")
@@ -380,107 +669,326 @@ background: {background}
 """.strip()
 
     # 更新或添加封面页
-    SLIDEV_CONTENT[0] = template
-    
-    save_slidev_content()
+    with project.lock:
+        project.store[0] = template
+        save_slidev_content(project)
     return SlidevResult(success=True, message="Cover page updated", output=0)
 
 
 @mcp.tool()
-def slidev_add_page(content: str, layout: str = "default", parameters: dict = {}) -> SlidevResult:
+def slidev_add_page(content: str, layout: str = "default", parameters: dict = {}, ctx: Context = None) -> SlidevResult:
     """
     Add new page.
     - `content` is markdown format text to describe page content.
     - `layout`: layout of the page
     - `parameters`: frontmatter parameters of the page
     """
-    global SLIDEV_CONTENT
-    
-    if not ACTIVE_SLIDEV_PROJECT:
+    project = PROJECTS.get(get_session(ctx))
+    if not project:
         return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
     
-    parameters['layout'] = layout
-    parameters['transition'] = 'slide-left'
-    frontmatter_string = transform_parameters_to_frontmatter(parameters)
-
-    template = f"""
----
-{frontmatter_string}
----
+    template = render_page(content, layout, parameters)
 
-{content}
-
-""".strip()
-
-    SLIDEV_CONTENT.append(template)
-    page_index = len(SLIDEV_CONTENT) - 1
-    save_slidev_content()
+    with project.lock:
+        page_index = project.store.append(template)
+        save_slidev_content(project)
     
     return SlidevResult(success=True, message=f"Page added at index {page_index}", output=page_index)
 
 
 @mcp.tool()
-def slidev_set_page(index: int, content: str, layout: str = "", parameters: dict = {}) -> SlidevResult:
+def slidev_set_page(index: int, content: str, layout: str = "", parameters: dict = {}, ctx: Context = None) -> SlidevResult:
     """
-    `index`: the index of the page to set. 0 is cover, so you should use index in [1, {len(SLIDEV_CONTENT) - 1}]
+    `index`: the index of the page to set. 0 is cover, so you should use index in [1, total - 1], where total is the page count of the active project (see `slidev_load`)
     `content`: the markdown content to set.
     - You can use ```code ```, latex or mermaid to represent more complex idea or concept. 
     - Too long or short content is forbidden.
     `layout`: the layout of the page.
     `parameters`: frontmatter parameters.
     """
-    global SLIDEV_CONTENT
-    
-    if not ACTIVE_SLIDEV_PROJECT:
+    project = PROJECTS.get(get_session(ctx))
+    if not project:
         return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
     
-    if index < 0 or index >= len(SLIDEV_CONTENT):
-        return SlidevResult(success=False, message=f"Invalid page index: {index}")
+    template = render_page(content, layout, parameters)
     
-    parameters['layout'] = layout
-    parameters['transition'] = 'slide-left'
-    frontmatter_string = transform_parameters_to_frontmatter(parameters)
+    with project.lock:
+        if index < 0 or index >= len(project.store):
+            return SlidevResult(success=False, message=f"Invalid page index: {index}")
+        project.store[index] = template
+        save_slidev_content(project)
     
-    template = f"""
----
-{frontmatter_string}
----
+    return SlidevResult(success=True, message=f"Page {index} updated", output=index)
 
-{content}
 
-""".strip()
-    
-    SLIDEV_CONTENT[index] = template
-    save_slidev_content()
-    
-    return SlidevResult(success=True, message=f"Page {index} updated", output=index)
+@mcp.tool()
+def slidev_add_pages(pages: List[PageSpec], ctx: Context = None) -> SlidevResult:
+    """
+    Add several pages at once, written to slides.md in one go.
+    - `pages`: list of {content, layout, parameters}, same meaning as in `slidev_add_page`
+    All pages are validated first; if any page is invalid nothing is added.
+    Returns the indices of the new pages.
+    """
+    project = PROJECTS.get(get_session(ctx))
+    if not project:
+        return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
+    if not pages:
+        return SlidevResult(success=False, message="No pages given")
+
+    for position, spec in enumerate(pages):
+        error = validate_page_spec(spec)
+        if error:
+            return SlidevResult(success=False, message=f"Invalid page at position {position}: {error}")
+
+    templates = [render_page(spec.content, spec.layout, spec.parameters) for spec in pages]
+    with project.lock:
+        indices = [project.store.append(template) for template in templates]
+        save_slidev_content(project)
+
+    return SlidevResult(success=True, message=f"{len(indices)} pages added at indices {indices[0]}-{indices[-1]}", output=indices)
+
+
+@mcp.tool()
+def slidev_set_pages(pages: List[IndexedPageSpec], ctx: Context = None) -> SlidevResult:
+    """
+    Update several pages at once, written to slides.md in one go.
+    - `pages`: list of {index, content, layout, parameters}, same meaning as in `slidev_set_page`
+    All pages are validated first; if any index or page is invalid nothing is changed.
+    Returns the updated indices.
+    """
+    project = PROJECTS.get(get_session(ctx))
+    if not project:
+        return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
+    if not pages:
+        return SlidevResult(success=False, message="No pages given")
+
+    for position, spec in enumerate(pages):
+        error = validate_page_spec(spec)
+        if error:
+            return SlidevResult(success=False, message=f"Invalid page at position {position}: {error}")
+    indices = [spec.index for spec in pages]
+    if len(set(indices)) != len(indices):
+        return SlidevResult(success=False, message="Duplicate page indices")
+
+    templates = [render_page(spec.content, spec.layout, spec.parameters) for spec in pages]
+    with project.lock:
+        invalid = [index for index in indices if index < 0 or index >= len(project.store)]
+        if invalid:
+            return SlidevResult(success=False, message=f"Invalid page indices: {invalid}")
+        for index, template in zip(indices, templates):
+            project.store[index] = template
+        save_slidev_content(project)
+
+    return SlidevResult(success=True, message=f"{len(indices)} pages updated", output=indices)
 
 
 @mcp.tool()
-def slidev_get_page(index: int) -> SlidevResult:
+def slidev_get_page(index: int, ctx: Context = None) -> SlidevResult:
     """get the content of the `index` th page"""
-    if not ACTIVE_SLIDEV_PROJECT:
+    project = PROJECTS.get(get_session(ctx))
+    if not project:
         return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
     
-    if index < 0 or index >= len(SLIDEV_CONTENT):
-        return SlidevResult(success=False, message=f"Invalid page index: {index}")
-    
-    return SlidevResult(success=True, message=f"Content of page {index}", output=SLIDEV_CONTENT[index])
+    with project.lock:
+        if index < 0 or index >= len(project.store):
+            return SlidevResult(success=False, message=f"Invalid page index: {index}")
+        
+        return SlidevResult(success=True, message=f"Content of page {index}", output=project.store[index])
+
+
+@mcp.tool()
+def slidev_query_pages(layout: str = "", frontmatter: Dict[str, str] = {}, text: str = "", limit: int = 20, ctx: Context = None) -> SlidevResult:
+    """
+    Find pages without loading the whole deck. All given conditions must match.
+    - `layout`: exact layout name, e.g. `figure-side`
+    - `frontmatter`: exact frontmatter values, e.g. {"transition": "fade"}
+    - `text`: words or phrase that must appear in the page body (whole words, case-insensitive)
+    - `limit`: max number of pages returned
+    Returns `index`, `layout` and a short `snippet` of each matching page; use `slidev_get_page` for full content.
+    """
+    project = PROJECTS.get(get_session(ctx))
+    if not project:
+        return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
+
+    with project.lock:
+        index = project.store.index
+        matches = index.query(layout=layout, frontmatter=frontmatter, text=text)
+        pages = [
+            {"index": page, "layout": index.frontmatter(page).get('layout', ''), "snippet": index.snippet(page, text)}
+            for page in matches[:max(limit, 0)]
+        ]
+
+    message = f"{len(matches)} pages match"
+    if len(pages) < len(matches):
+        message += f", showing first {len(pages)}"
+    return SlidevResult(success=True, message=message, output=pages)
 
 
 @mcp.tool()
-def slidev_save_outline(outline: SaveOutlineParam) -> SlidevResult:
+async def slidev_localize_images(markdown: str = "", ctx: Context = None) -> SlidevResult:
+    """
+    download remote images into the active project's `public/assets` and rewrite the links to the local copies,
+    so preview and export no longer fetch them from the network.
+    - without `markdown`: every slide of the active project is rewritten
+    - with `markdown` (e.g. a `websearch` result): the rewritten markdown is returned, the deck is not changed
+    Images that fail to download keep their original url.
+    """
+    # 持有租约，await 期间项目不会被淘汰
+    with PROJECTS.hold(get_session(ctx)) as project:
+        if not project:
+            return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
+
+        if markdown:
+            urls = find_image_urls(markdown)
+        else:
+            with project.lock:
+                urls = find_image_urls('\n\n'.join(project.store))
+        if not urls:
+            return SlidevResult(success=True, message="No remote images found", output=markdown or [])
+
+        results = await ASSETS.localize(urls, project.home)
+        mapping = localized_mapping(results)
+        failed = [item.url for item in results if item.error]
+        message = f"{len(mapping)}/{len(results)} images localized"
+        if failed:
+            message += f", failed: {', '.join(failed)}"
+
+        if markdown:
+            return SlidevResult(success=not failed, message=message, output=rewrite_image_urls(markdown, mapping))
+
+        with project.lock:
+            changed = []
+            for index, slide in enumerate(project.store):
+                rewritten = rewrite_image_urls(slide, mapping)
+                if rewritten != slide:
+                    project.store[index] = rewritten
+                    changed.append(index)
+            save_slidev_content(project)
+        return SlidevResult(success=not failed, message=message + f", {len(changed)} pages updated", output=[item.model_dump() for item in results])
+
+
+@mcp.tool()
+def slidev_save_outline(outline: SaveOutlineParam, ctx: Context = None) -> SlidevResult:
     """
     保存大纲到项目的 outline.json 文件中
     `outline`: 大纲项目列表，每个项目包含 group 和 content 字段
     """
-    if save_outline_content(outline):
+    if save_outline_content(PROJECTS.get(get_session(ctx)), outline):
         return SlidevResult(success=True, message="Outline saved successfully", output=None)
     return SlidevResult(success=False, message="Failed to save outline. No active project.", output=None)
 
 @mcp.tool()
-def slidev_export_project(path: str):
-    return ACTIVE_SLIDEV_PROJECT
+async def slidev_preview(ctx: Context = None) -> SlidevResult:
+    """
+    start (or reuse) a live preview server for the active project and return its url.
+    The server hot-reloads, so later page edits show up without calling this again.
+    """
+    with PROJECTS.hold(get_session(ctx)) as project:
+        if not project:
+            return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
+
+        status = await TOOLCHAIN.status(on_output=progress_forwarder(ctx))
+        if not status.ready:
+            return SlidevResult(success=False, message="slidev-cli is not ready, call slidev_check_environment first.")
+
+        flush_slidev_content(project)
+        try:
+            server = await PREVIEWS.start(project.name, project.home, status.slidev)
+        except RuntimeError as e:
+            return SlidevResult(success=False, message=str(e))
+        if server.state != 'running':
+            return SlidevResult(success=False, message=f"Preview server is {server.state}: {server.error}", output=server.to_dict())
+        return SlidevResult(success=True, message=f"Preview running at {server.url}", output=server.to_dict())
+
+
+@mcp.tool()
+async def slidev_preview_stop(ctx: Context = None) -> SlidevResult:
+    """stop the live preview server of the active project"""
+    project = PROJECTS.get(get_session(ctx))
+    if not project:
+        return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
+    if await PREVIEWS.stop(project.name):
+        return SlidevResult(success=True, message=f"Preview of {project.name} stopped")
+    return SlidevResult(success=False, message=f"No preview running for {project.name}")
+
+
+@mcp.tool()
+async def slidev_export_project(path: str = "", format: str = "pdf", incremental: bool = True, ctx: Context = None) -> SlidevResult:
+    """
+    export the active project in the background and return a job id immediately.
+    - `path`: output file (pdf) or directory (png, spa); defaults to `exports/` inside the project
+    - `format`: `pdf`, `png` (one image per slide) or `spa` (static website built by `slidev build`)
+    - `incremental`: only re-render slides changed since the last export. An incremental pdf is stitched from page images;
+      pass `false` for a full vector pdf rendered by slidev
+    Poll `slidev_job_status` for progress; when the job succeeds its `artifacts` lists the exported files.
+    Editing the deck while the export runs is safe, the export uses a snapshot.
+    """
+    with PROJECTS.hold(get_session(ctx)) as project:
+        if not project:
+            return SlidevResult(success=False, message="No active Slidev project. Please create or load one first.")
+        if format not in EXPORT_FORMATS:
+            return SlidevResult(success=False, message=f"Unknown export format {format!r}, use one of {', '.join(EXPORT_FORMATS)}")
+
+        status = await TOOLCHAIN.status(on_output=progress_forwarder(ctx))
+        if not status.ready:
+            return SlidevResult(success=False, message="slidev-cli is not ready, call slidev_check_environment first.")
+
+        flush_slidev_content(project)
+        try:
+            job = EXPORTS.submit(project, status.slidev, format, path, incremental)
+        except OSError as e:
+            return SlidevResult(success=False, message=f"fail to prepare export: {str(e)}")
+        return SlidevResult(success=True, message=f"Exporting {project.name} as {format} in background job {job.id}. Check progress with slidev_job_status.", output=job.to_dict())
+
+
+@mcp.tool()
+async def slidev_profile_report(limit: int = 10, tool: str = "", frames: int = 10, sort: str = "cumulative") -> SlidevResult:
+    """
+    list the slowest profiled tool calls and the functions they spent the most time in.
+    Profiling is off unless the server runs with `--profile [N]` or SLIDEV_MCP_PROFILE=N (profile every N-th call).
+    - `tool`: only calls of this tool
+    - `frames`: number of functions listed per call
+    - `sort`: `cumulative` (time including callees) or `tottime` (time in the function itself)
+    Each entry has the path of its `.prof` file for deeper analysis with pstats or snakeviz.
+    """
+    if sort not in ('cumulative', 'tottime'):
+        return SlidevResult(success=False, message=f"Unknown sort {sort!r}, use cumulative or tottime")
+    calls = await asyncio.to_thread(PROFILER.slowest, limit, tool, frames, sort)
+    state = f"profiling every {PROFILER.every} call(s)" if PROFILER.enabled else "profiling is off, start the server with --profile to enable it"
+    return SlidevResult(success=True, message=f"{len(calls)} profiled calls, {state}", output=[call.model_dump() for call in calls])
+
+
+@mcp.custom_route('/metrics', methods=['GET'])
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """Prometheus 格式的工具调用指标，仅 streamable-http 下可用。"""
+    return PlainTextResponse(METRICS.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def serve(transport: str):
+    """运行 MCP 服务，退出时关闭浏览器并写回所有打开的项目。"""
+    metrics_writer = None
+    try:
+        if transport == 'streamable-http':
+            await mcp.run_streamable_http_async()
+        else:
+            # stdio 下没有 HTTP 服务器，指标定期写入文件
+            metrics_file = os.environ.get('SLIDEV_MCP_METRICS_FILE', os.path.join(SLIDEV_MCP_ROOT, '.cache', 'metrics.prom'))
+            metrics_writer = asyncio.create_task(METRICS.write_periodically(metrics_file))
+            await mcp.run_stdio_async()
+    finally:
+        if metrics_writer:
+            metrics_writer.cancel()
+            try:
+                await metrics_writer
+            except asyncio.CancelledError:
+                pass
+        await JOBS.shutdown()
+        await PREVIEWS.shutdown()
+        await CRAWLER_POOL.close()
+        PROJECTS.flush_all()
+        CATALOG.save()
+        SEARCH.close()
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Slidev MCP Server')
@@ -488,7 +996,17 @@ if __name__ == "__main__":
                        choices=['stdio', 'streamable-http'], 
                        default='stdio',
                        help='Transport method (default: stdio)')
+    parser.add_argument('--host', default=None, help='Bind address for streamable-http (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=None, help='Port for streamable-http (default: 8000)')
+    parser.add_argument('--profile', nargs='?', type=int, const=1, default=None, metavar='N',
+                       help='Profile every N-th tool call into SLIDEV_MCP_ROOT/.cache/profiles (default N: 1)')
     
     args = parser.parse_args()
-    
-    mcp.run(transport=args.transport)
\ No newline at end of file
+    if args.host:
+        mcp.settings.host = args.host
+    if args.port:
+        mcp.settings.port = args.port
+    if args.profile is not None:
+        PROFILER.every = args.profile
+    
+    anyio.run(serve, args.transport)
\ No newline at end of file
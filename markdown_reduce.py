@@ -0,0 +1,206 @@
+import re
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel
+
+"""爬取结果的精简
+crawl4ai 返回的 markdown 里混着导航菜单、cookie 提示、页脚、重复的链接列表和跟踪像素，这些内容只会增加传输量和 token 数。
+reduce_markdown 按空行把 markdown 切成块，然后：
+    * 删除链接密集的块（导航、相关链接列表）
+    * 删除看起来像页面外壳的短块：cookie 提示、版权声明、登录注册等关键词只在带链接的块中判断，
+      "we use cookies"、"all rights reserved" 这类明确的样板短语另外也在页面开头和结尾几块中判断；
+      正文中讨论 cookie、版权法、公司注册的段落不受影响
+    * 删除跟踪像素图片，其他图片保留
+    * 内容全部被删掉的小节，其标题（或 "Related posts" 这类短标签）也一并删除
+    * 删除重复出现的段落，只保留第一次出现的
+    * 规范空白：去掉行尾空白、零宽字符，把连续的空行合并为一个
+代码块原样保留，不参与以上任何处理。
+精简后剩下的内容不到原文的 MIN_KEPT_RATIO 时，认为误删了正文，原样返回爬取结果。
+"""
+
+# 链接文字占比超过该值且链接数不少于 LINK_BLOCK_MIN_LINKS 的块视为导航或链接列表；
+# 几乎只由链接组成的块（例如 "上一页 / 下一页"）两个链接就够了
+LINK_DENSITY_THRESHOLD = 0.6
+LINK_BLOCK_MIN_LINKS = 3
+LINK_ONLY_DENSITY = 0.9
+# 不超过这么多字符、没有句末标点的单行视为短标签
+LABEL_MAX_CHARS = 30
+# 只有不超过这么多字符的块才按关键词判断是否为样板
+BOILERPLATE_MAX_CHARS = 300
+# 页面开头和结尾这么多块（不含代码块）中，明确的样板短语不要求带链接；页脚通常比页头长
+EDGE_HEAD_BLOCKS = 5
+EDGE_TAIL_BLOCKS = 8
+MIN_KEPT_RATIO = 0.15
+
+LINK_PATTERN = re.compile(r'(!?)\[([^\]]*)\]\(([^)]*)\)')
+IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)[^)]*\)')
+TRACKING_IMAGE_PATTERN = re.compile(
+    r'(pixel|beacon|tracking|analytics|doubleclick|/collect\?|1x1|spacer\.gif|/p\.gif|\.gif\?)', re.IGNORECASE)
+# 几乎只会出现在页面外壳中的短语
+BOILERPLATE_PATTERN = re.compile(
+    r'we use cookies|(this|our) (site|website) uses cookies|cookie (settings|preferences)|accept all'
+    r'|privacy policy|terms of (use|service)|all rights reserved|(©|copyright|\(c\))\s*(19|20)\d\d'
+    r'|subscribe to (our|the) newsletter|sign up for|skip to (main )?content|share (this|on)'
+    r'|版权所有|隐私政策|用户协议|扫码(关注|下载)|关注我们|分享到|备案号|ICP备',
+    re.IGNORECASE)
+# 正文中也常见的词，只在带链接的块中视为样板
+CHROME_WORD_PATTERN = re.compile(r'cookie|consent|©|copyright|sign in|log in|登录|注册|扫码', re.IGNORECASE)
+HEADING_PATTERN = re.compile(r'(#{1,6})\s')
+LABEL_END_PUNCTUATION = tuple('.:!?;,。：！？；，)）')
+ZERO_WIDTH_PATTERN = re.compile('[\u200b\u200c\u200d\u2060\ufeff]')
+FENCE_PATTERN = re.compile(r'^\s*(`{3,}|~{3,})(.*)$')
+
+
+class ReductionStats(BaseModel):
+    original_chars: int
+    reduced_chars: int
+    removed_blocks: int = 0
+    duplicate_blocks: int = 0
+    # 精简删掉了太多内容，返回的是原文
+    fallback: bool = False
+
+
+def split_blocks(markdown: str) -> List[Tuple[str, bool]]:
+    """按空行切分，返回 (块, 是否为代码块)；代码块中的空行不切分。"""
+    blocks: List[Tuple[str, bool]] = []
+    current: List[str] = []
+    fence = None
+
+    def close(is_code: bool = False):
+        if current:
+            blocks.append(('\n'.join(current), is_code))
+            current.clear()
+
+    for line in markdown.splitlines():
+        match = FENCE_PATTERN.match(line)
+        if fence is None and match:
+            close()
+            fence = match.group(1)
+            current.append(line)
+        elif fence is not None:
+            current.append(line)
+            # 结束标记只能由同一种字符组成，且不短于开始标记
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) and not match.group(2).strip():
+                close(is_code=True)
+                fence = None
+        elif not line.strip():
+            close()
+        else:
+            current.append(line)
+    # 没有闭合的代码块同样原样保留
+    close(is_code=fence is not None)
+    return blocks
+
+
+def is_tracking_image(url: str) -> bool:
+    return bool(TRACKING_IMAGE_PATTERN.search(url))
+
+
+def strip_tracking_images(block: str) -> str:
+    return IMAGE_PATTERN.sub(lambda match: '' if is_tracking_image(match.group(1)) else match.group(0), block)
+
+
+def is_boilerplate(block: str, edge: bool = False) -> bool:
+    """`edge` 表示块位于页面开头或结尾。"""
+    links = LINK_PATTERN.findall(block)
+    text = LINK_PATTERN.sub(lambda match: match.group(2), block)
+    visible = len(re.sub(r'[\s*_#>|`-]', '', text))
+    link_text = sum(len(re.sub(r'\s', '', label)) for bang, label, _ in links if not bang)
+    has_image = any(bang for bang, _, _ in links)
+
+    if not has_image and links:
+        density = link_text / max(visible, 1)
+        if density >= LINK_ONLY_DENSITY and len(links) >= 2:
+            return True
+        if density >= LINK_DENSITY_THRESHOLD and len(links) >= LINK_BLOCK_MIN_LINKS:
+            return True
+    if len(block) > BOILERPLATE_MAX_CHARS or has_image or block.lstrip().startswith('#'):
+        return False
+    if links:
+        return bool(BOILERPLATE_PATTERN.search(text) or CHROME_WORD_PATTERN.search(text))
+    return edge and bool(BOILERPLATE_PATTERN.search(text))
+
+
+def heading_level(block: str) -> int:
+    """标题返回 1-6 级，短标签视为 7 级，其他内容返回 0。"""
+    match = HEADING_PATTERN.match(block)
+    if match:
+        return len(match.group(1))
+    if '\n' not in block and len(block) <= LABEL_MAX_CHARS and '](' not in block and not block.endswith(LABEL_END_PUNCTUATION):
+        return 7
+    return 0
+
+
+def drop_empty_sections(entries: List[Optional[str]]) -> Tuple[List[str], int]:
+    """`entries` 中 None 表示被删掉的块；删除其后内容全部被删掉的标题和短标签，返回 (保留的块, 删除数)。"""
+    kept: List[str] = []
+    dropped = 0
+    # 下一个保留的块的标题级别：0 表示文档结束，None 表示正文
+    next_level: Optional[int] = 0
+    removed_after = False
+    for entry in reversed(entries):
+        if entry is None:
+            removed_after = True
+            continue
+        level = heading_level(entry)
+        if level and removed_after and next_level is not None and next_level <= level:
+            # 小节为空，上一级标题继续按同样的条件判断
+            dropped += 1
+            continue
+        kept.append(entry)
+        next_level = level or None
+        removed_after = False
+    kept.reverse()
+    return kept, dropped
+
+
+def normalize_block(block: str) -> str:
+    block = ZERO_WIDTH_PATTERN.sub('', block).replace('\xa0', ' ')
+    return '\n'.join(line.rstrip() for line in block.splitlines()).strip('\n')
+
+
+def dedupe_key(block: str) -> str:
+    return ' '.join(block.lower().split())
+
+
+def reduce_markdown(markdown: str) -> Tuple[str, ReductionStats]:
+    """精简爬取得到的 markdown，返回 (精简后的内容, 统计)。"""
+    entries: List[Optional[str]] = []
+    seen = set()
+    removed = 0
+    duplicates = 0
+
+    blocks = split_blocks(markdown)
+    text_blocks = sum(1 for _, is_code in blocks if not is_code)
+    position = 0
+    for block, is_code in blocks:
+        if is_code:
+            entries.append(block)
+            continue
+        edge = position < EDGE_HEAD_BLOCKS or position >= text_blocks - EDGE_TAIL_BLOCKS
+        position += 1
+        block = normalize_block(strip_tracking_images(block))
+        if not block.strip() or is_boilerplate(block, edge):
+            removed += 1
+            entries.append(None)
+            continue
+        key = dedupe_key(block)
+        # 很短的块（例如单独的分隔线）重复出现是正常的，不去重
+        if len(key) > 20 and key in seen:
+            duplicates += 1
+            entries.append(None)
+            continue
+        seen.add(key)
+        entries.append(block)
+
+    kept, dropped = drop_empty_sections(entries)
+    removed += dropped
+    reduced = '\n\n'.join(kept)
+    if markdown.strip() and len(reduced) < len(markdown) * MIN_KEPT_RATIO:
+        return markdown, ReductionStats(original_chars=len(markdown), reduced_chars=len(markdown), fallback=True)
+    return reduced, ReductionStats(
+        original_chars=len(markdown),
+        reduced_chars=len(reduced),
+        removed_blocks=removed,
+        duplicate_blocks=duplicates,
+    )
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mcp.server.fastmcp import FastMCP
+
+"""工具调用指标
+InstrumentedFastMCP 在每次工具调用前后记录：
+    * 调用次数，按结果分为 ok（正常返回）、failed（返回 success=false）和 error（抛出异常）
+    * 耗时直方图，以及请求参数、返回内容的字节数直方图
+    * 正在执行的调用数
+CommandRunner 和 CrawlerPool 另外记录子进程和网页爬取的耗时。
+所有指标以 Prometheus 文本格式输出：streamable-http 下由 /metrics 路由提供，
+stdio 下每 SLIDEV_MCP_METRICS_INTERVAL 秒写入 SLIDEV_MCP_METRICS_FILE（可以交给 node_exporter 的 textfile collector 收集）。
+"""
+
+DEFAULT_METRICS_INTERVAL = 15
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metrics:
+    """线程安全的计数器、仪表和直方图集合。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 指标名 -> (类型, 说明)
+        self._meta: Dict[str, Tuple[str, str]] = {}
+        self._values: Dict[str, Dict[Labels, Any]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str):
+        with self._lock:
+            self._meta[name] = (kind, help_text)
+            self._values.setdefault(name, {})
+
+    def inc(self, name: str, labels: Optional[Dict[str, str]] = None, value: float = 1):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None,
+                buckets: Sequence[float] = DURATION_BUCKETS):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）。"""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._values.items()):
+                kind, help_text = self._meta.get(name, ('untyped', ''))
+                if help_text:
+                    lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in sorted(series.items()):
+                    if isinstance(value, Histogram):
+                        cumulative = 0
+                        for bound, count in zip(value.buckets, value.counts):
+                            cumulative += count
+                            lines.append(f'{name}_bucket{_format_labels(labels, (("le", _format_value(bound)),))} {cumulative}')
+                        lines.append(f'{name}_bucket{_format_labels(labels, (("le", "+Inf"),))} {value.count}')
+                        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value.sum)}')
+                        lines.append(f'{name}_count{_format_labels(labels)} {value.count}')
+                    else:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self, path: str):
+        """原子地写入 `path`，读取方不会看到写了一半的文件。"""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.metrics-', dir=target.parent)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(tmp_path, target)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    async def write_periodically(self, path: str, interval: Optional[float] = None):
+        """stdio 下使用：每隔 `interval` 秒写一次文件，直到被取消，取消时再写最后一次。"""
+        interval = interval or float(os.environ.get('SLIDEV_MCP_METRICS_INTERVAL', DEFAULT_METRICS_INTERVAL))
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await asyncio.to_thread(self.write_file, path)
+        finally:
+            self.write_file(path)
+
+
+METRICS = Metrics()
+METRICS.describe('slidev_mcp_tool_calls_total', 'counter', 'Tool calls by tool and status (ok, failed, error)')
+METRICS.describe('slidev_mcp_tool_in_flight', 'gauge', 'Tool calls currently running')
+METRICS.describe('slidev_mcp_tool_duration_seconds', 'histogram', 'Tool call latency')
+METRICS.describe('slidev_mcp_tool_request_bytes', 'histogram', 'Size of the JSON encoded tool arguments')
+METRICS.describe('slidev_mcp_tool_response_bytes', 'histogram', 'Size of the content returned by the tool')
+METRICS.describe('slidev_mcp_crawl_duration_seconds', 'histogram', 'Time spent crawling a page in the browser')
+METRICS.describe('slidev_mcp_subprocess_duration_seconds', 'histogram', 'Run time of external commands such as slidev and npm')
+
+
+def payload_size(content: Any) -> int:
+    """工具返回内容（ContentBlock 列表，或 (列表, 结构化结果)）的字节数，结构化部分与文本重复，不计入。"""
+    if isinstance(content, tuple):
+        content = content[0]
+    if isinstance(content, dict):
+        return len(json.dumps(content, ensure_ascii=False, default=str).encode('utf-8'))
+    size = 0
+    for block in content or ():
+        text = getattr(block, 'text', None)
+        size += len(text.encode('utf-8')) if isinstance(text, str) else len(block.model_dump_json())
+    return size
+
+
+def result_failed(content: Any) -> bool:
+    """工具是否返回了 success=false 的结果。"""
+    structured = content[1] if isinstance(content, tuple) else None
+    return isinstance(structured, dict) and structured.get('success') is False
+
+
+class InstrumentedFastMCP(FastMCP):
+    """为每次工具调用记录指标的 FastMCP，传入 `profiler` 时同时按其采样间隔采集 profile（见 profiling.py）。"""
+
+    def __init__(self, *args, metrics: Metrics = METRICS, profiler=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+        self.profiler = profiler
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        # 未注册的工具名统一记为 unknown，避免客户端随意传入的名字让指标无限增长
+        tool = name if self._tool_manager.get_tool(name) else 'unknown'
+        labels = {'tool': tool}
+        self.metrics.observe('slidev_mcp_tool_request_bytes',
+                             len(json.dumps(arguments, ensure_ascii=False, default=str).encode('utf-8')),
+                             labels, BYTES_BUCKETS)
+        self.metrics.inc('slidev_mcp_tool_in_flight', labels)
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            call = super().call_tool(name, arguments)
+            content = await (self.profiler.profile(tool, call) if self.profiler else call)
+            status = 'failed' if result_failed(content) else 'ok'
+            self.metrics.observe('slidev_mcp_tool_response_bytes', payload_size(content), labels, BYTES_BUCKETS)
+            return content
+        finally:
+            self.metrics.observe('slidev_mcp_tool_duration_seconds', time.perf_counter() - start, labels)
+            self.metrics.inc('slidev_mcp_tool_in_flight', labels, -1)
+            self.metrics.inc('slidev_mcp_tool_calls_total', {'tool': tool, 'status': status})
@@ -0,0 +1,245 @@
+import asyncio
+import os
+import signal
+import socket
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+"""Slidev 预览服务
+每个项目最多对应一个常驻的 `slidev` 开发服务器，Vite 冷启动只发生一次，之后修改 slides.md 由 Slidev 自己热更新：
+    * 端口从 SLIDEV_MCP_PREVIEW_PORTS（例如 3030-3049）中分配，跳过已被其他程序占用的端口
+    * 同时运行的预览服务器不超过 SLIDEV_MCP_MAX_PREVIEWS 个，满了之后关闭最久没有使用的那个；
+      加上 CommandRunner 的 SLIDEV_MCP_MAX_WORKERS，整个服务同时运行的 Node 进程数是有上限的
+    * 服务器意外退出时自动重启，连续失败 MAX_RESTARTS 次后放弃
+    * 超过 SLIDEV_MCP_PREVIEW_IDLE_SECONDS 秒没有被预览或编辑的服务器会被回收
+"""
+
+DEFAULT_PREVIEW_PORTS = '3030-3049'
+DEFAULT_MAX_PREVIEWS = 2
+DEFAULT_PREVIEW_IDLE_SECONDS = 10 * 60
+# 等待开发服务器开始监听端口的时间
+STARTUP_TIMEOUT = 60
+MAX_RESTARTS = 3
+STABLE_SECONDS = 60
+REAP_INTERVAL = 30
+KILL_GRACE_SECONDS = 3
+PREVIEW_OUTPUT_LINES = 50
+
+
+def parse_port_range(spec: str) -> List[int]:
+    """解析 '3030-3049' 或 '3030,3031,4000' 形式的端口列表。"""
+    ports = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        low, _, high = part.partition('-')
+        ports.extend(range(int(low), int(high or low) + 1))
+    return ports
+
+
+def port_available(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(('127.0.0.1', port))
+        except OSError:
+            return False
+    return True
+
+
+class PreviewServer:
+    def __init__(self, name: str, home: str, port: int):
+        self.name = name
+        self.home = home
+        self.port = port
+        self.state = 'starting'
+        self.restarts = 0
+        self.error: Optional[str] = None
+        self.output = deque(maxlen=PREVIEW_OUTPUT_LINES)
+        self.started_at = time.time()
+        self.last_used = time.monotonic()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.task: Optional[asyncio.Task] = None
+        self.ready = asyncio.Event()
+        self.stopping = False
+
+    @property
+    def url(self) -> str:
+        return f'http://localhost:{self.port}/'
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "url": self.url,
+            "port": self.port,
+            "state": self.state,
+            "pid": self.process.pid if self.process else None,
+            "restarts": self.restarts,
+            "error": self.error,
+            "output": list(self.output),
+            "started_at": self.started_at,
+        }
+
+
+class PreviewManager:
+    def __init__(self, ports: Optional[List[int]] = None, max_servers: Optional[int] = None,
+                 idle_seconds: Optional[float] = None):
+        self.ports = ports or parse_port_range(os.environ.get('SLIDEV_MCP_PREVIEW_PORTS', DEFAULT_PREVIEW_PORTS))
+        self.max_servers = max_servers or int(os.environ.get('SLIDEV_MCP_MAX_PREVIEWS', DEFAULT_MAX_PREVIEWS))
+        self.idle_seconds = idle_seconds or float(os.environ.get('SLIDEV_MCP_PREVIEW_IDLE_SECONDS', DEFAULT_PREVIEW_IDLE_SECONDS))
+        self._servers: Dict[str, PreviewServer] = {}
+        self._lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def start(self, name: str, home: str, slidev: str) -> PreviewServer:
+        """返回项目 `name` 的预览服务器，没有时启动一个并等待它开始监听。"""
+        async with self._lock:
+            server = self._servers.get(name)
+            if server is None or server.state in ('stopped', 'failed'):
+                if server is not None:
+                    del self._servers[name]
+                await self._make_room()
+                server = PreviewServer(name, home, self._allocate_port())
+                server.task = asyncio.get_running_loop().create_task(self._supervise(server, slidev))
+                self._servers[name] = server
+                self._ensure_reaper()
+            server.last_used = time.monotonic()
+
+        try:
+            await asyncio.wait_for(server.ready.wait(), STARTUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            server.error = server.error or f"dev server did not listen on port {server.port} within {STARTUP_TIMEOUT}s"
+        return server
+
+    def touch(self, name: str):
+        """项目被编辑时调用，推迟对应预览服务器的回收。"""
+        server = self._servers.get(name)
+        if server:
+            server.last_used = time.monotonic()
+
+    async def stop(self, name: str) -> bool:
+        async with self._lock:
+            server = self._servers.pop(name, None)
+        if server is None:
+            return False
+        await self._stop_server(server)
+        return True
+
+    async def shutdown(self):
+        """关闭所有预览服务器，服务退出时调用。"""
+        if self._reaper:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        async with self._lock:
+            servers = list(self._servers.values())
+            self._servers.clear()
+        await asyncio.gather(*(self._stop_server(server) for server in servers), return_exceptions=True)
+
+    def _allocate_port(self) -> int:
+        used = {server.port for server in self._servers.values()}
+        for port in self.ports:
+            if port not in used and port_available(port):
+                return port
+        raise RuntimeError(f"no free preview port in {self.ports[0]}-{self.ports[-1]}")
+
+    async def _make_room(self):
+        """在持有 `_lock` 时调用，预览服务器已满时关闭最久没有使用的那个。"""
+        while len(self._servers) >= self.max_servers:
+            oldest = min(self._servers.values(), key=lambda server: server.last_used)
+            del self._servers[oldest.name]
+            await self._stop_server(oldest)
+
+    async def _supervise(self, server: PreviewServer, slidev: str):
+        command = [slidev, 'slides.md', '--port', str(server.port), '--bind', '127.0.0.1']
+        while not server.stopping:
+            server.state = 'starting'
+            server.ready.clear()
+            try:
+                server.process = await asyncio.create_subprocess_exec(
+                    *command, cwd=server.home, stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                    # 独立的进程组，停止时连同 Vite 派生的子进程一起结束
+                    start_new_session=True)
+            except OSError as e:
+                server.error = str(e)
+                server.state = 'failed'
+                server.ready.set()
+                return
+
+            launched = time.monotonic()
+            await asyncio.gather(self._pump(server), self._wait_listening(server))
+            returncode = await server.process.wait()
+            if server.stopping:
+                break
+            # 只统计连续的失败，稳定运行过一段时间后崩溃的重新计数
+            if time.monotonic() - launched > STABLE_SECONDS:
+                server.restarts = 0
+            server.restarts += 1
+            server.error = f"dev server exited with code {returncode}"
+            if server.restarts > MAX_RESTARTS:
+                server.state = 'failed'
+                server.ready.set()
+                return
+            await asyncio.sleep(min(2 ** server.restarts, 10))
+        server.state = 'stopped'
+
+    async def _pump(self, server: PreviewServer):
+        while True:
+            raw = await server.process.stdout.readline()
+            if not raw:
+                return
+            server.output.append(raw.decode('utf-8', errors='replace').rstrip())
+
+    async def _wait_listening(self, server: PreviewServer):
+        while server.process.returncode is None:
+            try:
+                _, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            except OSError:
+                await asyncio.sleep(0.2)
+                continue
+            writer.close()
+            server.state = 'running'
+            server.error = None
+            server.ready.set()
+            return
+
+    async def _stop_server(self, server: PreviewServer):
+        server.stopping = True
+        server.state = 'stopped'
+        process = server.process
+        if process and process.returncode is None:
+            try:
+                self._signal(process, signal.SIGTERM)
+                await asyncio.wait_for(process.wait(), KILL_GRACE_SECONDS)
+            except ProcessLookupError:
+                pass
+            except asyncio.TimeoutError:
+                try:
+                    self._signal(process, signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+        if server.task:
+            server.task.cancel()
+            await asyncio.gather(server.task, return_exceptions=True)
+        server.ready.set()
+
+    @staticmethod
+    def _signal(process: asyncio.subprocess.Process, sig: int):
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, sig)
+        else:
+            process.send_signal(sig)
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap())
+
+    async def _reap(self):
+        while self._servers:
+            await asyncio.sleep(REAP_INTERVAL)
+            now = time.monotonic()
+            for server in list(self._servers.values()):
+                if now - server.last_used > self.idle_seconds:
+                    await self.stop(server.name)
@@ -0,0 +1,149 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import re
+import time
+from pathlib import Path
+from typing import Awaitable, List, Optional, TypeVar
+
+from pydantic import BaseModel
+
+"""按工具调用采集的 cProfile
+通过 `main.py --profile [N]` 或 SLIDEV_MCP_PROFILE=N 开启，每 N 次工具调用采集一次（N=1 即每次都采集）：
+    * 每次采集写入 SLIDEV_MCP_ROOT/.cache/profiles/<时间>-<序号>-<工具名>-<耗时>us.prof，可以用 pstats、snakeviz 打开
+    * 目录中最多保留 SLIDEV_MCP_PROFILE_KEEP 个文件，超出时删除最旧的
+    * slidev_profile_report 工具按耗时列出最近最慢的调用及其最耗时的函数，服务重启后仍然可以读取之前的文件
+异步工具等待期间事件循环上运行的其他请求也会被计入，子进程（slidev、npm、浏览器）中的耗时只体现为等待时间。
+同一时刻只采集一个调用，其余调用照常执行、不采集；写入 profile 失败不影响工具调用本身。
+"""
+
+DEFAULT_PROFILE_KEEP = 200
+# 与其他服务端数据一样放在 .cache 下，不占用项目名，也不会被项目扫描当作项目
+PROFILE_DIR = 'profiles'
+PROFILE_NAME_PATTERN = re.compile(r'^(?P<stamp>\d{8}T\d{6})-(?P<seq>\d+)-(?P<tool>[\w.-]+?)-(?P<micros>\d+)us\.prof$')
+# 这些文件中的函数只是调度和包装，统计最耗时的函数时跳过
+PLUMBING_PATTERN = re.compile(r'[/\\](asyncio|anyio|mcp|starlette|concurrent)[/\\]|[/\\](profiling|metrics)\.py$|^<frozen')
+
+T = TypeVar('T')
+
+
+class ProfileFrame(BaseModel):
+    function: str
+    calls: int
+    self_seconds: float
+    cumulative_seconds: float
+
+
+class ProfiledCall(BaseModel):
+    tool: str
+    started: str
+    duration_ms: float
+    path: str
+    frames: List[ProfileFrame] = []
+
+
+def describe_function(key) -> str:
+    filename, line, name = key
+    if filename == '~':
+        # 内置函数，例如 {method 'read' of '_io.BufferedReader' objects}
+        return name
+    parts = Path(filename).parts[-2:]
+    return f"{'/'.join(parts)}:{line}({name})"
+
+
+def top_frames(path: str, limit: int = 10, sort: str = 'cumulative') -> List[ProfileFrame]:
+    """读取 .prof 文件，返回最耗时的 `limit` 个函数，`sort` 为 cumulative（含子调用）或 tottime（自身）。"""
+    stats = pstats.Stats(path).stats
+    index = 3 if sort == 'cumulative' else 2
+    frames = []
+    for key, (_, calls, self_seconds, cumulative_seconds, _) in sorted(stats.items(), key=lambda item: item[1][index], reverse=True):
+        if PLUMBING_PATTERN.search(key[0]):
+            continue
+        frames.append(ProfileFrame(function=describe_function(key), calls=calls,
+                                   self_seconds=round(self_seconds, 6), cumulative_seconds=round(cumulative_seconds, 6)))
+        if len(frames) >= limit:
+            break
+    return frames
+
+
+class Profiler:
+    def __init__(self, root: str, every: Optional[int] = None, keep: Optional[int] = None):
+        self.directory = Path(root) / '.cache' / PROFILE_DIR
+        self.every = every if every is not None else int(os.environ.get('SLIDEV_MCP_PROFILE', 0) or 0)
+        self.keep = keep or int(os.environ.get('SLIDEV_MCP_PROFILE_KEEP', DEFAULT_PROFILE_KEEP))
+        self._calls = 0
+        self._active = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.every > 0
+
+    async def profile(self, tool: str, call: Awaitable[T]) -> T:
+        """执行 `call`，按采样间隔决定是否采集。"""
+        if not self.enabled:
+            return await call
+        self._calls += 1
+        if self._active or self._calls % self.every:
+            return await call
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 已有其他 profiler（例如调试器）在运行
+            return await call
+        self._active = True
+        sequence = self._calls
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        start = time.perf_counter()
+        try:
+            return await call
+        finally:
+            profiler.disable()
+            self._active = False
+            safe_tool = re.sub(r'[^\w.-]', '_', tool) or 'unknown'
+            name = f"{stamp}-{sequence}-{safe_tool}-{int((time.perf_counter() - start) * 1e6)}us.prof"
+            try:
+                await asyncio.to_thread(self._dump, profiler, name)
+            except OSError:
+                pass
+
+    def _dump(self, profiler: cProfile.Profile, name: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(self.directory / name))
+        self._prune()
+
+    def _prune(self):
+        files = sorted(self.directory.glob('*.prof'), key=lambda path: path.stat().st_mtime)
+        for stale in files[:max(0, len(files) - self.keep)]:
+            stale.unlink(missing_ok=True)
+
+    def recorded(self) -> List[ProfiledCall]:
+        """目录中所有采集结果，不含函数明细。"""
+        calls = []
+        if not self.directory.is_dir():
+            return calls
+        for path in self.directory.glob('*.prof'):
+            match = PROFILE_NAME_PATTERN.match(path.name)
+            if not match:
+                continue
+            calls.append(ProfiledCall(
+                tool=match.group('tool'),
+                started=time.strftime('%Y-%m-%d %H:%M:%S', time.strptime(match.group('stamp'), '%Y%m%dT%H%M%S')),
+                duration_ms=int(match.group('micros')) / 1000,
+                path=str(path),
+            ))
+        return calls
+
+    def slowest(self, limit: int = 10, tool: str = '', frames: int = 10, sort: str = 'cumulative') -> List[ProfiledCall]:
+        calls = [call for call in self.recorded() if not tool or call.tool == tool]
+        calls.sort(key=lambda call: call.duration_ms, reverse=True)
+        calls = calls[:limit]
+        for call in calls:
+            try:
+                call.frames = top_frames(call.path, frames, sort)
+            except (OSError, EOFError, ValueError, TypeError):
+                # 文件可能在读取前被清理，或者不是完整的 profile
+                call.frames = []
+        return calls
@@ -0,0 +1,216 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from slide_store import SlideStore
+
+"""按会话隔离的项目注册表
+    * 每个 MCP 会话（ServerSession）记录自己当前打开的项目名，会话结束后映射随之回收
+    * 已打开的项目按 LRU 缓存，同名项目在多个会话之间共享同一个 SlideStore 和锁
+    * 超过 SLIDEV_MCP_MAX_OPEN_PROJECTS 个项目或空闲超过 SLIDEV_MCP_PROJECT_IDLE_SECONDS 秒的项目会被写回并淘汰，
+      之后再次访问时从磁盘透明地重新加载
+    * 跨越 await 使用项目的工具通过 hold() 持有租约，持有期间项目不会被淘汰，
+      否则淘汰后再次打开会得到同一个 slides.md 的第二个 SlideStore，两者互相覆盖
+
+写回策略由 SLIDEV_MCP_WRITE_MODE 决定：
+    * sync（默认）：每次修改后立即写回 slides.md
+    * write-behind：修改写入内存和日志（见 slide_store），slides.md 在最后一次修改 SLIDEV_MCP_FLUSH_DELAY 秒后才写回，
+      连续修改最多推迟 MAX_FLUSH_DELAY_FACTOR 倍的时间；加载、导出、预览、淘汰和退出时都会立即写回。
+      SLIDEV_MCP_JOURNAL_FSYNC=0 时日志不 fsync，延迟更低，但掉电时可能丢失最后几次修改
+"""
+
+DEFAULT_MAX_OPEN_PROJECTS = 32
+DEFAULT_PROJECT_IDLE_SECONDS = 30 * 60
+DEFAULT_WRITE_MODE = 'sync'
+DEFAULT_FLUSH_DELAY = 1.0
+MAX_FLUSH_DELAY_FACTOR = 5
+
+
+class OpenProject:
+    """一个已打开的 Slidev 项目，所有读写都需要持有 `lock`。"""
+
+    def __init__(self, name: str, home: str, write_behind: bool = False,
+                 flush_delay: float = DEFAULT_FLUSH_DELAY, journal_fsync: bool = True):
+        self.name = name
+        self.home = home
+        self.slides_path = str(Path(home) / "slides.md")
+        self.lock = threading.RLock()
+        self.store = SlideStore(self.slides_path)
+        self.last_used = time.monotonic()
+        # 正在持有该项目的 hold() 数量，由 ProjectRegistry 在 `_lock` 下修改
+        self.leases = 0
+        self.write_behind = write_behind
+        self.flush_delay = flush_delay
+        self.journal_fsync = journal_fsync
+        self._disk_signature = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._pending_since: Optional[float] = None
+
+    def reload(self):
+        self.store = SlideStore.load(self.slides_path)
+        self.store.journaling = self.write_behind
+        self.store.journal_fsync = self.journal_fsync
+        self._disk_signature = self._stat_signature()
+
+    def save(self):
+        """修改之后调用：sync 模式下立即写回，write-behind 模式下交给防抖定时器。"""
+        if not self.write_behind:
+            self.flush()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中（例如直接调用工具函数），没有定时器可用
+            self.flush()
+            return
+
+        now = loop.time()
+        if self._pending_since is None:
+            self._pending_since = now
+        deadline = min(now + self.flush_delay, self._pending_since + self.flush_delay * MAX_FLUSH_DELAY_FACTOR)
+        if self._flush_handle:
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_at(deadline, self._flush_due)
+
+    def flush(self) -> bool:
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending_since = None
+        written = self.store.flush()
+        if written:
+            self._disk_signature = self._stat_signature()
+        return written
+
+    def _flush_due(self):
+        self._flush_handle = None
+        with self.lock:
+            self.flush()
+
+    def changed_on_disk(self) -> bool:
+        """slides.md 是否在服务之外被修改过。"""
+        return self._stat_signature() != self._disk_signature
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.slides_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+class ProjectRegistry:
+    def __init__(self, home_resolver: Callable[[str], str],
+                 max_open: Optional[int] = None, idle_seconds: Optional[float] = None):
+        self.home_resolver = home_resolver
+        self.max_open = max_open or int(os.environ.get('SLIDEV_MCP_MAX_OPEN_PROJECTS', DEFAULT_MAX_OPEN_PROJECTS))
+        self.idle_seconds = idle_seconds or float(os.environ.get('SLIDEV_MCP_PROJECT_IDLE_SECONDS', DEFAULT_PROJECT_IDLE_SECONDS))
+        self.write_behind = os.environ.get('SLIDEV_MCP_WRITE_MODE', DEFAULT_WRITE_MODE) == 'write-behind'
+        self.flush_delay = float(os.environ.get('SLIDEV_MCP_FLUSH_DELAY', DEFAULT_FLUSH_DELAY))
+        self.journal_fsync = os.environ.get('SLIDEV_MCP_JOURNAL_FSYNC', '1') != '0'
+        self._lock = threading.Lock()
+        self._projects: 'OrderedDict[str, OpenProject]' = OrderedDict()
+        self._sessions: 'weakref.WeakKeyDictionary[object, str]' = weakref.WeakKeyDictionary()
+        # 没有会话对象时（例如直接调用工具函数）使用的默认槽位
+        self._default_name: Optional[str] = None
+
+    def open(self, session, name: str) -> OpenProject:
+        """让 `session` 切换到项目 `name`，并从磁盘加载最新内容。"""
+        project = self._acquire(name)
+        with project.lock:
+            # 先写回尚未落盘的修改（包括从日志中重放的修改）
+            project.flush()
+            if project.changed_on_disk():
+                project.reload()
+        self._bind(session, name)
+        return project
+
+    def get(self, session) -> Optional[OpenProject]:
+        """返回 `session` 当前的项目，已被淘汰的项目会重新加载。"""
+        name = self._bound_name(session)
+        if name is None:
+            return None
+        return self._acquire(name)
+
+    @contextmanager
+    def hold(self, session) -> Iterator[Optional[OpenProject]]:
+        """与 get 相同，但在 with 块内持有租约，项目不会被淘汰；在 await 前后都要使用项目时使用。"""
+        name = self._bound_name(session)
+        if name is None:
+            yield None
+            return
+        project = self._acquire(name, lease=True)
+        try:
+            yield project
+        finally:
+            with self._lock:
+                project.leases -= 1
+
+    def close(self, session):
+        if session is None:
+            self._default_name = None
+            return
+        with self._lock:
+            self._sessions.pop(session, None)
+
+    def flush_all(self):
+        with self._lock:
+            projects = list(self._projects.values())
+        for project in projects:
+            with project.lock:
+                project.flush()
+
+    def _bind(self, session, name: str):
+        if session is None:
+            self._default_name = name
+            return
+        with self._lock:
+            self._sessions[session] = name
+
+    def _bound_name(self, session) -> Optional[str]:
+        if session is None:
+            return self._default_name
+        with self._lock:
+            return self._sessions.get(session)
+
+    def _acquire(self, name: str, lease: bool = False) -> OpenProject:
+        with self._lock:
+            project = self._projects.get(name)
+            if project is not None:
+                project.leases += lease
+                self._touch(project)
+                return project
+
+        loaded = OpenProject(name, self.home_resolver(name), self.write_behind, self.flush_delay, self.journal_fsync)
+        loaded.reload()
+        with self._lock:
+            # 其他线程可能已经抢先加载了同一个项目
+            project = self._projects.setdefault(name, loaded)
+            project.leases += lease
+            self._touch(project)
+            return project
+
+    def _touch(self, project: OpenProject):
+        """在持有 `_lock` 时调用，刷新 LRU 顺序并淘汰超出容量或空闲过久的项目。"""
+        self._projects.move_to_end(project.name)
+        project.last_used = now = time.monotonic()
+        for name in list(self._projects.keys())[:-1]:
+            stale = self._projects[name]
+            over_capacity = len(self._projects) > self.max_open
+            idle = now - stale.last_used > self.idle_seconds
+            if not (over_capacity or idle):
+                break
+            # 正在被其他请求使用或持有租约的项目不淘汰
+            if stale.leases or not stale.lock.acquire(blocking=False):
+                continue
+            try:
+                stale.flush()
+                del self._projects[name]
+            finally:
+                stale.lock.release()
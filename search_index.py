@@ -0,0 +1,317 @@
+import json
+import os
+import sqlite3
+import threading
+import weakref
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from slide_store import SlideStore
+from utils import bigram_tokenize, slide_hash, slide_title, split_frontmatter, split_runs
+
+"""跨项目全文检索
+SLIDEV_MCP_ROOT 下所有项目的幻灯片和 outline.json 的倒排索引，保存在 SLIDEV_MCP_ROOT/.cache/search.sqlite3（SQLite FTS5）：
+    * 每一页幻灯片的正文、每一条大纲各是一个文档，标题（幻灯片的第一个标题、大纲的 group）单独一列，排序时权重更高
+    * 中文等没有空格的文字按相邻两字切分（见 utils.bigram_tokenize），查询中连续的中文按短语匹配，单字按前缀匹配
+    * 保存讲演时只更新 SlideStore 记录的修改或追加过的页（SlideStore.pop_changes），保存大纲时重建该项目的大纲文档，
+      不重建整个索引；还没有索引的项目、或者加载的 slides.md 与索引记录的不一致时，不在保存时建立，标记后在下一次检索时重建
+    * 检索时检查 SLIDEV_MCP_ROOT 本身的修改时间，发现在服务之外新建或删除的项目；
+      在服务之外修改了已有项目的文件需要 refresh=True，按修改时间和大小逐个检查
+第一次检索时为还没有索引的项目建立索引，项目很多时这一次会慢一些。
+"""
+
+SEARCH_INDEX_FILE = 'search.sqlite3'
+SEARCH_INDEX_VERSION = '1'
+SNIPPET_CHARS = 120
+# 标题列和正文列的 bm25 权重
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE IF NOT EXISTS projects (name TEXT PRIMARY KEY, slides_mtime REAL, slides_size INTEGER, outline_mtime REAL)",
+    "CREATE TABLE IF NOT EXISTS documents (id INTEGER PRIMARY KEY, project TEXT NOT NULL, source TEXT NOT NULL, "
+    "page INTEGER NOT NULL, digest TEXT NOT NULL, title TEXT NOT NULL, body TEXT NOT NULL)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS documents_page ON documents (project, source, page)",
+    # 词元已经由 bigram_tokenize 切分好并以空格连接，ascii 分词器只按空格拆开，不会再拆开中文
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(title, body, tokenize='ascii')",
+)
+
+# (标题, 正文, 内容哈希)
+Document = Tuple[str, str, str]
+
+
+class SearchHit(BaseModel):
+    project: str
+    source: str
+    page: int
+    title: str
+    snippet: str
+    score: float
+
+
+def match_expression(query: str) -> str:
+    """把查询转换为 FTS5 表达式，所有部分都要出现（AND）。"""
+    terms = []
+    for run, cjk in split_runs(query):
+        if cjk and len(run) == 1:
+            terms.append(f'"{run}"*')
+        elif cjk:
+            terms.append('"' + ' '.join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+        else:
+            terms.append(f'"{run}"')
+    return ' AND '.join(terms)
+
+
+def make_snippet(body: str, query: str) -> str:
+    """截取正文中最早出现查询中任意部分的位置附近的文字。"""
+    lowered = body.lower()
+    positions = [lowered.find(run) for run, _ in split_runs(query)]
+    positions = [position for position in positions if position >= 0]
+    start = max(0, min(positions) - SNIPPET_CHARS // 3) if positions else 0
+    snippet = ' '.join(body[start:start + SNIPPET_CHARS].split())
+    if start > 0:
+        snippet = '…' + snippet
+    if start + SNIPPET_CHARS < len(body):
+        snippet += '…'
+    return snippet
+
+
+def slide_document(slide: str, digest: str = '') -> Document:
+    _, body = split_frontmatter(slide)
+    return slide_title(body), body, digest or slide_hash(slide)
+
+
+def outline_documents(path: Path) -> List[Document]:
+    """outline.json 中的每一条大纲，文件不存在或格式不对时为空。"""
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+        items = data.get('outlines', []) if isinstance(data, dict) else []
+    except (OSError, ValueError):
+        return []
+    documents = []
+    for item in items:
+        if isinstance(item, dict):
+            group, content = str(item.get('group', '')), str(item.get('content', ''))
+            documents.append((group, content, slide_hash(f'{group}\n{content}')))
+    return documents
+
+
+class SearchIndex:
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.path = self.root / '.cache' / SEARCH_INDEX_FILE
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # 项目名 -> 已索引的幻灯片页数，避免每次保存都查询数据库
+        self._pages: Dict[str, int] = {}
+        # 已经核对过加载时的文件与索引一致的 SlideStore
+        self._checked: 'weakref.WeakSet[SlideStore]' = weakref.WeakSet()
+        # 更新索引失败的项目，下一次检索时从磁盘重建
+        self._stale: Set[str] = set()
+
+    def update_deck(self, name: str, store: SlideStore):
+        """保存讲演之后调用（需要持有项目的锁），只重写上次调用之后修改或追加的页。"""
+        changes = store.pop_changes()
+        total = len(store)
+        with self._lock:
+            try:
+                conn = self._connect()
+                if store not in self._checked:
+                    self._checked.add(store)
+                    if self._recorded_signature(conn, name) != store.loaded_signature:
+                        self._stale.add(name)
+                if name in self._stale:
+                    return
+                known = self._page_count(conn, name)
+                pages = set(range(total)) if changes is None else {page for page in changes if page < total}
+                pages.update(range(min(known, total), total))
+                changed = {page: slide_document(store[page]) for page in pages}
+                with conn:
+                    self._write_documents(conn, name, 'slides', changed, total)
+                    self._record_project(conn, name)
+                self._pages[name] = total
+            except sqlite3.Error:
+                self._forget(name)
+
+    def update_outline(self, name: str):
+        """保存 outline.json 之后调用，大纲很短，整体替换。"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                documents = outline_documents(self.root / name / 'outline.json')
+                with conn:
+                    self._write_documents(conn, name, 'outline', dict(enumerate(documents)), len(documents))
+                    self._record_project(conn, name)
+            except sqlite3.Error:
+                self._forget(name)
+
+    def search(self, query: str, limit: int = 20, project: str = '', refresh: bool = False) -> List[SearchHit]:
+        """按 bm25 相关度从高到低返回命中的页，索引不可用（例如 SQLite 没有 FTS5）时抛出 sqlite3.Error。"""
+        expression = match_expression(query)
+        with self._lock:
+            conn = self._connect()
+            self._sync(conn, refresh)
+            if not expression or limit <= 0:
+                return []
+            sql = ("SELECT d.project, d.source, d.page, d.title, d.body, "
+                   f"bm25(documents_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+                   "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+                   "WHERE documents_fts MATCH ?")
+            parameters: list = [expression]
+            if project:
+                sql += " AND d.project = ?"
+                parameters.append(project)
+            sql += " ORDER BY score LIMIT ?"
+            parameters.append(limit)
+            rows = conn.execute(sql, parameters).fetchall()
+        # bm25 越小越相关，返回时取反，分数越大越相关
+        return [SearchHit(project=name, source=source, page=page, title=title,
+                          snippet=make_snippet(body, query), score=round(-score, 4))
+                for name, source, page, title, body, score in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """在持有 `_lock` 时调用，第一次使用时打开数据库，版本不一致时重建。"""
+        if self._conn is not None:
+            return self._conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            if self._meta(conn, 'version') != SEARCH_INDEX_VERSION:
+                with conn:
+                    for table in ('projects', 'documents', 'documents_fts', 'meta'):
+                        conn.execute(f"DELETE FROM {table}")
+                    self._set_meta(conn, 'version', SEARCH_INDEX_VERSION)
+            conn.commit()
+        except sqlite3.Error:
+            conn.close()
+            raise
+        self._conn = conn
+        return conn
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value: str):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _page_count(self, conn: sqlite3.Connection, name: str) -> int:
+        pages = self._pages.get(name)
+        if pages is None:
+            row = conn.execute("SELECT MAX(page) FROM documents WHERE project = ? AND source = 'slides'", (name,)).fetchone()
+            pages = row[0] + 1 if row[0] is not None else 0
+        return pages
+
+    @staticmethod
+    def _recorded_signature(conn: sqlite3.Connection, name: str) -> Optional[Tuple[float, int]]:
+        row = conn.execute("SELECT slides_mtime, slides_size FROM projects WHERE name = ?", (name,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    @staticmethod
+    def _write_documents(conn: sqlite3.Connection, name: str, source: str, changed: Dict[int, Document], total: int):
+        """写入 `changed` 中的页，并删除页码不小于 `total` 的文档，需要在事务中调用。"""
+        stale = conn.execute("SELECT id FROM documents WHERE project = ? AND source = ? AND page >= ?",
+                             (name, source, total)).fetchall()
+        stale += [row for page in changed for row in conn.execute(
+            "SELECT id FROM documents WHERE project = ? AND source = ? AND page = ?", (name, source, page))]
+        for (document_id,) in stale:
+            conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (document_id,))
+            conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+        for page, (title, body, digest) in changed.items():
+            cursor = conn.execute(
+                "INSERT INTO documents (project, source, page, digest, title, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, source, page, digest, title, body))
+            conn.execute("INSERT INTO documents_fts (rowid, title, body) VALUES (?, ?, ?)",
+                         (cursor.lastrowid, ' '.join(bigram_tokenize(title)), ' '.join(bigram_tokenize(body))))
+
+    def _record_project(self, conn: sqlite3.Connection, name: str):
+        """记录项目文件的修改时间和大小，refresh 时据此判断是否需要重建。"""
+        slides_mtime, slides_size, outline_mtime = self._file_signature(name)
+        conn.execute("INSERT OR REPLACE INTO projects (name, slides_mtime, slides_size, outline_mtime) VALUES (?, ?, ?, ?)",
+                     (name, slides_mtime, slides_size, outline_mtime))
+
+    def _file_signature(self, name: str) -> Tuple[float, int, float]:
+        home = self.root / name
+        try:
+            stat = os.stat(home / 'slides.md')
+            slides_mtime, slides_size = stat.st_mtime, stat.st_size
+        except OSError:
+            slides_mtime, slides_size = 0, 0
+        try:
+            outline_mtime = os.stat(home / 'outline.json').st_mtime
+        except OSError:
+            outline_mtime = 0
+        return slides_mtime, slides_size, outline_mtime
+
+    def _forget(self, name: str):
+        self._pages.pop(name, None)
+        self._stale.add(name)
+
+    def _sync(self, conn: sqlite3.Connection, refresh: bool):
+        """在持有 `_lock` 时调用，让索引与磁盘上的项目一致。"""
+        try:
+            signature = str(os.stat(self.root).st_mtime_ns)
+        except OSError:
+            signature = ''
+        if signature == self._meta(conn, 'root_signature') and not refresh and not self._stale:
+            return
+
+        names = set()
+        try:
+            with os.scandir(self.root) as iterator:
+                for item in iterator:
+                    if not item.name.startswith('.') and item.is_dir() and os.path.isfile(os.path.join(item.path, 'slides.md')):
+                        names.add(item.name)
+        except OSError:
+            pass
+
+        indexed = {name: (slides_mtime, slides_size, outline_mtime)
+                   for name, slides_mtime, slides_size, outline_mtime in conn.execute("SELECT * FROM projects")}
+        for name in set(indexed) - names:
+            with conn:
+                self._remove_project(conn, name)
+        for name in sorted(names):
+            if name in indexed and name not in self._stale and not (refresh and self._file_signature(name) != indexed[name]):
+                continue
+            self._index_from_disk(conn, name)
+        with conn:
+            self._set_meta(conn, 'root_signature', signature)
+        self._stale.clear()
+
+    def _remove_project(self, conn: sqlite3.Connection, name: str):
+        conn.execute("DELETE FROM documents_fts WHERE rowid IN (SELECT id FROM documents WHERE project = ?)", (name,))
+        conn.execute("DELETE FROM documents WHERE project = ?", (name,))
+        conn.execute("DELETE FROM projects WHERE name = ?", (name,))
+        self._pages.pop(name, None)
+
+    def _index_from_disk(self, conn: sqlite3.Connection, name: str):
+        home = self.root / name
+        try:
+            store = SlideStore.load(str(home / 'slides.md'))
+        except (OSError, ValueError):
+            with conn:
+                self._remove_project(conn, name)
+            return
+        slides = dict(enumerate(slide_document(slide) for slide in store))
+        outline = dict(enumerate(outline_documents(home / 'outline.json')))
+        with conn:
+            self._remove_project(conn, name)
+            self._write_documents(conn, name, 'slides', slides, len(slides))
+            self._write_documents(conn, name, 'outline', outline, len(outline))
+            self._record_project(conn, name)
+        self._pages[name] = len(slides)
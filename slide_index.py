@@ -0,0 +1,124 @@
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from utils import slide_hash, slide_title, split_frontmatter, tokenize
+
+"""页面检索索引
+为一个项目的所有幻灯片维护倒排索引，slidev_query_pages 不需要把整份讲演传回给 agent 就能定位页面：
+    * frontmatter 的每一个 (键, 值) 映射到包含它的页码集合，layout、transition 以及自定义参数都可以精确匹配
+    * 正文切分后的词元映射到页码集合，文本查询先用词元求交集缩小范围，再检查候选页中这些词元是否按顺序连续出现，
+      即按整词匹配短语，忽略大小写和标点
+索引由 SlideStore 在第一次查询时建立，之后每一次修改、追加、整体替换都会同步更新对应的页，不需要重新扫描整个讲演。
+"""
+
+SNIPPET_CHARS = 120
+
+
+class IndexedSlide(NamedTuple):
+    frontmatter: Dict[str, str]
+    body: str
+    # 词元序列，前后加空格后用于短语匹配
+    phrase: str
+    tokens: Set[str]
+    digest: str
+    title: str
+
+
+class SlideIndex:
+    def __init__(self, slides: Optional[List[str]] = None):
+        self._slides: List[IndexedSlide] = []
+        self._fields: Dict[Tuple[str, str], Set[int]] = defaultdict(set)
+        self._tokens: Dict[str, Set[int]] = defaultdict(set)
+        for slide in slides or []:
+            self.append(slide)
+
+    def __len__(self) -> int:
+        return len(self._slides)
+
+    def append(self, content: str) -> int:
+        self._slides.append(self._analyze(content))
+        index = len(self._slides) - 1
+        self._add_postings(index)
+        return index
+
+    def update(self, index: int, content: str):
+        self._remove_postings(index)
+        self._slides[index] = self._analyze(content)
+        self._add_postings(index)
+
+    def frontmatter(self, index: int) -> Dict[str, str]:
+        return self._slides[index].frontmatter
+
+    def digests(self) -> List[str]:
+        """每一页的内容哈希，按页码排列。"""
+        return [slide.digest for slide in self._slides]
+
+    def summary(self, index: int) -> Dict[str, str]:
+        """一页的摘要：layout、标题和内容哈希。"""
+        slide = self._slides[index]
+        return {"index": index, "layout": slide.frontmatter.get('layout', ''), "title": slide.title, "hash": slide.digest}
+
+    def query(self, layout: str = '', frontmatter: Optional[Dict[str, str]] = None,
+              text: str = '') -> List[int]:
+        """返回同时满足所有条件的页码，按页码升序排列；没有任何条件时返回全部页码。"""
+        conditions = dict(frontmatter or {})
+        if layout:
+            conditions['layout'] = layout
+
+        candidates: Optional[Set[int]] = None
+        # 先用最小的集合求交集
+        postings = [self._fields.get((str(key), str(value).strip()), set()) for key, value in conditions.items()]
+        words = tokenize(text)
+        postings += [self._tokens.get(token, set()) for token in set(words)]
+        for posting in sorted(postings, key=len):
+            candidates = set(posting) if candidates is None else candidates & posting
+            if not candidates:
+                return []
+
+        if candidates is None:
+            candidates = set(range(len(self._slides)))
+        if len(words) > 1:
+            phrase = f" {' '.join(words)} "
+            candidates = {index for index in candidates if phrase in self._slides[index].phrase}
+        return sorted(candidates)
+
+    def snippet(self, index: int, text: str = '') -> str:
+        """截取正文中第一次出现 `text` 的位置附近的文字，没有 `text` 时取正文开头。"""
+        slide = self._slides[index]
+        words = tokenize(text)
+        position = slide.body.lower().find(words[0]) if words else -1
+        start = max(0, position - SNIPPET_CHARS // 3) if position >= 0 else 0
+        snippet = ' '.join(slide.body[start:start + SNIPPET_CHARS].split())
+        if start > 0:
+            snippet = '…' + snippet
+        if start + SNIPPET_CHARS < len(slide.body):
+            snippet += '…'
+        return snippet
+
+    def _analyze(self, content: str) -> IndexedSlide:
+        frontmatter, body = split_frontmatter(content)
+        words = tokenize(body)
+        return IndexedSlide(frontmatter, body, f" {' '.join(words)} ", set(words), slide_hash(content), slide_title(body))
+
+    def _add_postings(self, index: int):
+        slide = self._slides[index]
+        for field in slide.frontmatter.items():
+            self._fields[field].add(index)
+        for token in slide.tokens:
+            self._tokens[token].add(index)
+
+    def _remove_postings(self, index: int):
+        slide = self._slides[index]
+        for field in slide.frontmatter.items():
+            self._discard(self._fields, field, index)
+        for token in slide.tokens:
+            self._discard(self._tokens, token, index)
+
+    @staticmethod
+    def _discard(postings: Dict, key, index: int):
+        indices = postings.get(key)
+        if indices is None:
+            return
+        indices.discard(index)
+        if not indices:
+            del postings[key]
@@ -0,0 +1,278 @@
+import json
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
+
+from slide_index import SlideIndex
+from utils import ASCII_WHITESPACE, LINE_BREAK_BYTES, iter_slide_spans, parse_markdown_slides
+
+"""slides.md 增量持久化
+整体重写时 slides.md 的布局为 '\\n\\n'.join(slides)，SlideStore 记录每一页在文件中的字节偏移：
+    * 第 i 页占据的区域为 [offset_i, offset_{i+1})，包含页尾的分隔空行；最后一页一直延伸到文件末尾
+    * 修改某一页时，如果新内容（加至少一个换行）放得进原区域，就原地覆盖，剩余部分用换行填充
+    * 修改最后一页直接截断重写尾部；追加页面只在文件末尾追加
+    * 只有中间某页变长放不下、或者文件使用 CRLF 换行时，才通过临时文件 + rename 原子地整体重写
+加载时通过 mmap 单次扫描文件得到每一页的字节范围，页与页之间的空白行都算作前一页的可用空间。
+
+write-behind 模式（journaling 为 True）下，每次修改先以一行 JSON 追加到 slides.md.journal，slides.md 稍后再统一写回：
+    * 写回成功后删除日志；加载时如果日志还在（上次进程在写回之前退出），在 slides.md 的基础上重放日志
+    * 日志末尾不完整的一行（写到一半时崩溃）会被忽略
+    * 重放是幂等的：rename 之后、删除日志之前崩溃时，slides.md 已经包含日志里的修改，
+      append 记录带着目标页码，页码已经存在就跳过，set / replace 本身可以重复执行
+    * 有日志时写回总是通过临时文件 + rename 整体替换，原地覆盖写到一半崩溃会让日志无法正确重放
+    * journal_fsync 为 True 时每条日志都 fsync，牺牲一点延迟换取掉电也不丢修改
+"""
+
+SLIDE_SEPARATOR = b'\n\n'
+JOURNAL_SUFFIX = '.journal'
+
+
+class SlideStore:
+    """内存中的幻灯片列表，并跟踪每一页的字节偏移与脏标记。"""
+
+    def __init__(self, slides_path: Optional[str] = None, slides: Optional[List[str]] = None):
+        self.slides_path = slides_path
+        self.slides: List[str] = list(slides or [])
+        # 已落盘的每一页（去掉首尾空白后）的起始字节偏移，长度等于 _persisted
+        self._offsets: List[int] = []
+        self._file_size = 0
+        self._persisted = 0
+        self._dirty: Set[int] = set()
+        self._needs_rewrite = True
+        self._index: Optional[SlideIndex] = None
+        self.journaling = False
+        self.journal_fsync = True
+        # 日志中是否有尚未写回 slides.md 的修改
+        self._journal_pending = False
+        # 上次 pop_changes 之后修改或追加的页，None 表示整体替换过
+        self._changes: Optional[Set[int]] = set()
+        # 加载时 slides.md 的 (修改时间, 大小)
+        self.loaded_signature: Optional[Tuple[float, int]] = None
+
+    @classmethod
+    def load(cls, slides_path: str) -> 'SlideStore':
+        with open(slides_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            if size == 0:
+                store = cls(slides_path)
+                store.loaded_signature = (stat.st_mtime, size)
+                store._mark_clean([])
+                store._replay_journal()
+                return store
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                # CRLF 等非 '\n' 换行统一转换为 LF，第一次写入时整体重写一次
+                if any(buf.find(token) != -1 for token in LINE_BREAK_BYTES):
+                    slides = parse_markdown_slides(buf[:].decode('utf-8'))
+                    store = cls(slides_path, [slide.strip() for slide in slides if slide.strip()])
+                    store.loaded_signature = (stat.st_mtime, size)
+                    store._replay_journal()
+                    return store
+
+                store = cls(slides_path)
+                store.loaded_signature = (stat.st_mtime, size)
+                for span in iter_slide_spans(buf):
+                    chunk = buf[span.start:span.end]
+                    stripped = chunk.strip(ASCII_WHITESPACE)
+                    offset = span.start + len(chunk) - len(chunk.lstrip(ASCII_WHITESPACE))
+                    text = stripped.decode('utf-8')
+                    # 与 str.strip 一致，首尾的全角空格等 Unicode 空白也要去掉
+                    if text and (text[0].isspace() or text[-1].isspace()):
+                        lstripped = text.lstrip()
+                        offset += len(stripped) - len(lstripped.encode('utf-8'))
+                        text = lstripped.rstrip()
+                    if not text:
+                        continue
+                    store.slides.append(text)
+                    store._offsets.append(offset)
+
+        store._file_size = size
+        store._persisted = len(store.slides)
+        store._needs_rewrite = False
+        store._replay_journal()
+        return store
+
+    @property
+    def journal_path(self) -> str:
+        return self.slides_path + JOURNAL_SUFFIX
+
+    def __len__(self) -> int:
+        return len(self.slides)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.slides)
+
+    def __getitem__(self, index: int) -> str:
+        return self.slides[index]
+
+    def __setitem__(self, index: int, content: str):
+        if index < 0:
+            index += len(self.slides)
+        self.slides[index] = content
+        if index < self._persisted:
+            self._dirty.add(index)
+        if self._changes is not None:
+            self._changes.add(index)
+        if self._index is not None:
+            self._index.update(index, content)
+        self._log({"op": "set", "index": index, "content": content})
+
+    def append(self, content: str) -> int:
+        self.slides.append(content)
+        if self._index is not None:
+            self._index.append(content)
+        index = len(self.slides) - 1
+        if self._changes is not None:
+            self._changes.add(index)
+        self._log({"op": "append", "index": index, "content": content})
+        return index
+
+    def replace_all(self, slides: List[str]):
+        """整体替换内容，下次 flush 时重写整个文件。"""
+        self.slides = list(slides)
+        self._dirty.clear()
+        self._needs_rewrite = True
+        self._index = None
+        self._changes = None
+        self._log({"op": "replace", "slides": self.slides})
+
+    def pop_changes(self) -> Optional[Set[int]]:
+        """返回上次调用之后修改或追加的页码并重新开始记录，期间整体替换过时返回 None。"""
+        changes, self._changes = self._changes, set()
+        return changes
+
+    @property
+    def index(self) -> SlideIndex:
+        """页面检索索引，第一次访问时建立，之后随每次修改增量更新。"""
+        if self._index is None:
+            self._index = SlideIndex(self.slides)
+        return self._index
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._needs_rewrite or self._journal_pending or bool(self._dirty) or self._persisted < len(self.slides)
+
+    def flush(self) -> bool:
+        """把脏页写回 slides.md，返回是否真正发生了写入。"""
+        if not self.slides_path or not self.is_dirty:
+            return False
+
+        if self._needs_rewrite or self._journal_pending:
+            self._rewrite()
+            return True
+
+        # 先确认所有脏页都能原地写入，避免写到一半才发现需要整体重写
+        last = self._persisted - 1
+        patches = []
+        for index in sorted(self._dirty):
+            data = self.slides[index].encode('utf-8')
+            if index == last:
+                patches.append((index, data, None))
+                continue
+            capacity = self._offsets[index + 1] - self._offsets[index]
+            if len(data) + 1 > capacity:
+                self._rewrite()
+                return True
+            patches.append((index, data, capacity))
+
+        with open(self.slides_path, 'r+b') as f:
+            for index, data, capacity in patches:
+                f.seek(self._offsets[index])
+                if capacity is None:
+                    f.write(data)
+                    f.truncate()
+                    self._file_size = self._offsets[index] + len(data)
+                else:
+                    f.write(data + b'\n' * (capacity - len(data)))
+
+            if self._persisted < len(self.slides):
+                f.seek(self._file_size)
+                for index in range(self._persisted, len(self.slides)):
+                    data = self.slides[index].encode('utf-8')
+                    if self._persisted > 0:
+                        f.write(SLIDE_SEPARATOR)
+                        self._file_size += len(SLIDE_SEPARATOR)
+                    self._offsets.append(self._file_size)
+                    f.write(data)
+                    self._file_size += len(data)
+                    self._persisted += 1
+
+        self._dirty.clear()
+        return True
+
+    def to_bytes(self) -> bytes:
+        """当前内容按整体重写时的布局编码，与 flush 后 slides.md 的内容一致。"""
+        return SLIDE_SEPARATOR.join(slide.encode('utf-8') for slide in self.slides)
+
+    def _rewrite(self):
+        encoded = [slide.encode('utf-8') for slide in self.slides]
+        directory = os.path.dirname(os.path.abspath(self.slides_path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.slides-', suffix='.md.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(SLIDE_SEPARATOR.join(encoded))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.slides_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._mark_clean(encoded)
+
+    def _mark_clean(self, encoded: List[bytes]):
+        self._offsets = []
+        position = 0
+        for index, data in enumerate(encoded):
+            if index > 0:
+                position += len(SLIDE_SEPARATOR)
+            self._offsets.append(position)
+            position += len(data)
+        self._file_size = position
+        self._persisted = len(encoded)
+        self._dirty.clear()
+        self._needs_rewrite = False
+        if self._journal_pending:
+            Path(self.journal_path).unlink(missing_ok=True)
+            self._journal_pending = False
+
+    def _log(self, record: dict):
+        if not (self.journaling and self.slides_path):
+            return
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            if self.journal_fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self._journal_pending = True
+
+    def _replay_journal(self):
+        """在刚从 slides.md 加载的内容上重放上次未写回的修改。"""
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+
+        journaling, self.journaling = self.journaling, False
+        try:
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时写到一半的最后一行
+                    break
+                op = record.get('op')
+                if op == 'set' and 0 <= record['index'] < len(self.slides):
+                    self[record['index']] = record['content']
+                elif op == 'append':
+                    # 旧版本写的记录没有页码，只能照常追加
+                    if record.get('index', len(self.slides)) >= len(self.slides):
+                        self.append(record['content'])
+                elif op == 'replace':
+                    self.replace_all(record['slides'])
+        finally:
+            self.journaling = journaling
+        self._journal_pending = True
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+from command_runner import CommandRunner, OutputCallback
+
+"""Node.js / Slidev 工具链探测
+运行一次 `slidev --version` 需要启动 Node，耗时几百毫秒，所以探测结果会被缓存：
+    * 缓存键由 PATH 以及 node / npm / slidev 可执行文件的路径和修改时间组成，任何一项变化都会重新探测
+    * 结果同时保存在内存和 SLIDEV_MCP_ROOT/.cache/toolchain.json 中，每次新启动的 stdio 进程也能直接复用
+    * 需要探测时，`on_output` 收到探测命令的每一行输出，工具据此转发为进度通知；命中缓存时不会被调用
+"""
+
+TOOLCHAIN_BINARIES = ('node', 'npm', 'slidev')
+PROBE_TIMEOUT = 10
+
+
+class ToolchainStatus(BaseModel):
+    key: str
+    node: Optional[str] = None
+    npm: Optional[str] = None
+    slidev: Optional[str] = None
+    slidev_version: Optional[str] = None
+    checked_at: float
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.node and self.slidev_version)
+
+
+def toolchain_fingerprint() -> str:
+    parts = [os.environ.get('PATH', '')]
+    for binary in TOOLCHAIN_BINARIES:
+        path = shutil.which(binary)
+        try:
+            mtime = os.stat(path).st_mtime_ns if path else None
+        except OSError:
+            mtime = None
+        parts.append(f'{binary}={path}@{mtime}')
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ToolchainProbe:
+    def __init__(self, root: str, runner: CommandRunner):
+        self.cache_path = Path(root) / '.cache' / 'toolchain.json'
+        self.runner = runner
+        self._lock = asyncio.Lock()
+        self._status: Optional[ToolchainStatus] = None
+
+    async def status(self, refresh: bool = False, on_output: Optional[OutputCallback] = None) -> ToolchainStatus:
+        key = toolchain_fingerprint()
+        async with self._lock:
+            if not refresh:
+                cached = self._status or self._read_disk()
+                if cached and cached.key == key:
+                    self._status = cached
+                    return cached
+            self._status = await self._probe(key, on_output)
+            self._write_disk(self._status)
+            return self._status
+
+    def invalidate(self):
+        self._status = None
+        self.cache_path.unlink(missing_ok=True)
+
+    async def _probe(self, key: str, on_output: Optional[OutputCallback] = None) -> ToolchainStatus:
+        paths: Dict[str, Optional[str]] = {binary: shutil.which(binary) for binary in TOOLCHAIN_BINARIES}
+        version = None
+        if paths['node'] and paths['slidev']:
+            try:
+                result = await self.runner.run([paths['slidev'], '--version'], timeout=PROBE_TIMEOUT, on_output=on_output)
+                if result.success:
+                    version = result.stdout.strip()
+            except OSError:
+                version = None
+        return ToolchainStatus(key=key, slidev_version=version, checked_at=time.time(), **paths)
+
+    def _read_disk(self) -> Optional[ToolchainStatus]:
+        try:
+            return ToolchainStatus.model_validate_json(self.cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, status: ToolchainStatus):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_path.write_text(status.model_dump_json(), encoding='utf-8')
+        except OSError:
+            pass
@@ -1,36 +1,185 @@
-def parse_markdown_slides(content: str) -> list:
+import hashlib
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# str.splitlines 认作换行的全部字符；旧的逐行解析器按它们切行，这里统一换成 '\n'
+LINE_BREAKS = ('\r', '\x0b', '\x0c', '\x1c', '\x1d', '\x1e', '\x85', '\u2028', '\u2029')
+LINE_BREAK_BYTES = tuple(char.encode('utf-8') for char in LINE_BREAKS)
+LINE_BREAK_PATTERN = re.compile('\r\n|[%s]' % ''.join(LINE_BREAKS))
+# str.strip 会去掉的 ASCII 字符；非 ASCII 的空白（全角空格等）需要解码后再判断
+ASCII_WHITESPACE = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
+
+
+class SlideSpan(NamedTuple):
+    """一页幻灯片在缓冲区中的字节范围，均为左闭右开区间。"""
+    start: int
+    end: int
+    # frontmatter 内容（不含两条 `---`），没有 frontmatter 时为 None
+    frontmatter: Optional[Tuple[int, int]]
+    # frontmatter 之后的正文；frontmatter 没有闭合时为 None
+    body: Optional[Tuple[int, int]]
+
+    def text(self, buf: Union[bytes, memoryview]) -> str:
+        return bytes(buf[self.start:self.end]).decode('utf-8')
+
+
+def _is_blank(chunk) -> bool:
+    return not bytes(chunk).decode('utf-8', 'replace').strip()
+
+
+def iter_delimiter_lines(buf) -> Iterator[Tuple[int, int]]:
     """
-    解析markdown内容，按YAML front matter切分幻灯片
+    找出整行只有 `---`（允许首尾空白）的行，产出 (行首, 行尾) 偏移，行尾不含换行符。
+    这样的行既是幻灯片分隔符也是 frontmatter 的边界。
+    `buf` 只能以 '\n' 换行；空白按 str.strip 判断，包括全角空格等 Unicode 空白。
+    """
+    size = len(buf)
+    position = 0
+    while True:
+        found = buf.find(b'---', position)
+        if found == -1:
+            return
+        after = found + 3
+        # 绝大多数分隔行就是单独的 `---`，直接判断前后是否是换行
+        if (found == 0 or buf[found - 1] == 10) and (after == size or buf[after] == 10):
+            yield found, after
+            position = after
+            continue
+        line_start = buf.rfind(b'\n', 0, found) + 1
+        line_end = buf.find(b'\n', after)
+        if line_end == -1:
+            line_end = size
+        if _is_blank(buf[line_start:found]) and _is_blank(buf[after:line_end]):
+            yield line_start, line_end
+        position = line_end
+
+
+def iter_slide_spans(buf) -> Iterator[SlideSpan]:
     """
-    slides = []
-    current_slide = []
+    单次扫描 `buf`（bytes 或 mmap），按 YAML front matter 切分幻灯片并依次产出每一页的范围。
+    只定位分隔行，不拆分行、不复制内容，需要文本时再通过 SlideSpan.text 取出。
+    """
+    size = len(buf)
+    # 与 str.splitlines 一致：文件末尾的换行不属于最后一页
+    tail = size - 1 if size and buf[size - 1:size] == b'\n' else size
+
+    start = 0
+    frontmatter_start = None
+    frontmatter = None
+    body_start = 0
     in_yaml = False
-    
-    for line in content.splitlines():
-        if line.strip() == '---' and not in_yaml:
-            # 开始YAML front matter
-            if not current_slide:
-                in_yaml = True
-                current_slide.append(line)
-            else:
+
+    for line_start, line_end in iter_delimiter_lines(buf):
+        next_line = min(line_end + 1, size)
+        if not in_yaml:
+            if line_start > 0:
                 # 遇到新的幻灯片分隔符
-                slides.append('\n'.join(current_slide))
-                current_slide = [line]
-                in_yaml = True
-        elif line.strip() == '---' and in_yaml:
+                end = line_start - 1
+                yield SlideSpan(start, end, frontmatter, (body_start, end) if body_start is not None else None)
+            # 开始YAML front matter
+            start = line_start
+            frontmatter_start = next_line
+            frontmatter = None
+            body_start = None
+            in_yaml = True
+        else:
             # 结束YAML front matter
-            current_slide.append(line)
+            frontmatter = (frontmatter_start, max(frontmatter_start, line_start - 1))
+            body_start = next_line
             in_yaml = False
-        else:
-            current_slide.append(line)
-    
+
     # 添加最后一个幻灯片
-    if current_slide:
-        slides.append('\n'.join(current_slide))
-    
-    return slides
+    if size:
+        end = max(start, tail)
+        yield SlideSpan(start, end, frontmatter, (min(body_start, end), end) if body_start is not None else None)
+
+
+def parse_markdown_slides(content: str) -> list:
+    """
+    解析markdown内容，按YAML front matter切分幻灯片
+    换行与空白的处理和原先基于 str.splitlines / str.strip 的逐行实现一致
+    """
+    # 整体跑一遍正则比逐个 `in` 慢得多，绝大多数文件只有 '\n'
+    if any(char in content for char in LINE_BREAKS):
+        content = LINE_BREAK_PATTERN.sub('\n', content)
+    buf = content.encode('utf-8')
+    return [span.text(buf) for span in iter_slide_spans(buf)]
+
+
+
+def split_frontmatter(slide: str) -> Tuple[Dict[str, str], str]:
+    """
+    把一页幻灯片拆成 frontmatter 和正文。frontmatter 按 `key: value` 逐行解析，
+    与 transform_parameters_to_frontmatter 的输出格式对应，值统一为去掉首尾空白的字符串。
+    """
+    buf = slide.encode('utf-8')
+    span = next(iter_slide_spans(buf), None)
+    if span is None:
+        return {}, ''
+    if span.frontmatter is None:
+        return {}, slide.strip()
+
+    frontmatter = {}
+    for line in buf[span.frontmatter[0]:span.frontmatter[1]].decode('utf-8').splitlines():
+        key, sep, value = line.partition(':')
+        # 缩进的行属于上一个键的嵌套值，不单独索引
+        if not sep or not key.strip() or line[:1].isspace():
+            continue
+        frontmatter[key.strip()] = value.strip().strip('\'"')
+    body = buf[span.body[0]:span.body[1]].decode('utf-8') if span.body else ''
+    return frontmatter, body.strip()
+
+
+
+def slide_hash(slide: str) -> str:
+    """一页幻灯片内容的哈希，客户端据此判断本地副本是否过期。"""
+    return hashlib.sha256(slide.encode('utf-8')).hexdigest()[:16]
 
 
+def slide_title(body: str, max_chars: int = 80) -> str:
+    """正文中的第一个标题，没有标题时取第一行非空文本。"""
+    fallback = ''
+    for line in body.splitlines():
+        line = line.strip()
+        if line.startswith('#'):
+            return line.lstrip('#').strip()[:max_chars]
+        if line and not fallback:
+            fallback = line[:max_chars]
+    return fallback
+
+# 中日韩文字没有空格分词，按单字切分；其余文字按连续的字母数字切分
+_CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_TOKEN_PATTERN = re.compile(f'[^\\W_{_CJK_CHARS}]+|[{_CJK_CHARS}]')
+
+
+def tokenize(text: str) -> List[str]:
+    """把文本切分为小写的词元，用于页面检索。"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+_RUN_PATTERN = re.compile(f'[^\\W_{_CJK_CHARS}]+|[{_CJK_CHARS}]+')
+_CJK_PATTERN = re.compile(f'[{_CJK_CHARS}]')
+
+
+def split_runs(text: str) -> List[Tuple[str, bool]]:
+    """把小写后的文本切分为连续的字母数字串和中日韩文字串，返回 (文字, 是否为中日韩文字)。"""
+    return [(run, bool(_CJK_PATTERN.match(run))) for run in _RUN_PATTERN.findall(text.lower())]
+
+
+def bigram_tokenize(text: str) -> List[str]:
+    """
+    跨项目全文检索使用的词元：中日韩文字串切分为相邻两字的二元组，并在末尾补上最后一个单字，
+    这样任意一个字都是某个词元的开头，单字查询可以用前缀匹配；其余文字按连续的字母数字切分。
+    """
+    tokens = []
+    for run, cjk in split_runs(text):
+        if cjk and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return tokens
+
 
 if __name__ == '__main__':
     # markdown = open('./test.md', 'r', encoding='utf-8').read()